@@ -0,0 +1,197 @@
+"""Headless JSON API for recommendations and review sentiment
+
+Run with several worker processes (each loads the model once and maps the
+shared model files):
+
+    uvicorn api:app --workers 4 --port 8000
+
+Endpoints:
+    GET  /health
+    GET  /metrics     Prometheus text, or JSON lines with ?format=jsonl
+    GET  /recommend?title=avatar&k=10
+    POST /recommend   {"titles": ["avatar", "alien"], "k": 10}
+    POST /recommend/history
+                      {"titles": ["avatar", "alien"], "weights": [1, 2], "dislikes": ["titanic"], "k": 10}
+    POST /sentiment   {"reviews": ["Great film", "Dull and boring"]}
+
+Each recommendation result carries the catalog title the query resolved
+to as "match", which differs from "title" after a prefix or fuzzy match.
+"""
+import asyncio
+import json
+import os
+from urllib.parse import parse_qs
+
+from movie_recommender.service import RecommendationService
+from movie_recommender.tracing import TRACER, stage, to_jsonl, to_prometheus
+
+MAX_BODY_BYTES = 1 << 20
+MAX_K = 100
+MAX_BATCH = 1000
+PATHS = ("/health", "/metrics", "/recommend", "/recommend/history", "/sentiment")
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _parse_k(value):
+    try:
+        k = int(value)
+    except (TypeError, ValueError):
+        raise HTTPError(400, "k must be an integer")
+    if not 1 <= k <= MAX_K:
+        raise HTTPError(400, f"k must be between 1 and {MAX_K}")
+    return k
+
+
+def _string_list(payload, field):
+    values = payload.get(field) if isinstance(payload, dict) else None
+    if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+        raise HTTPError(400, f"'{field}' must be a list of strings")
+    if len(values) > MAX_BATCH:
+        raise HTTPError(413, f"at most {MAX_BATCH} {field} per request")
+    return values
+
+
+async def _read_json(receive):
+    body = bytearray()
+    while True:
+        message = await receive()
+        body.extend(message.get("body", b""))
+        if len(body) > MAX_BODY_BYTES:
+            raise HTTPError(413, "request body too large")
+        if not message.get("more_body"):
+            break
+    try:
+        return json.loads(body or b"{}")
+    except ValueError:
+        raise HTTPError(400, "request body must be JSON")
+
+
+async def _send(send, status, body, content_type):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_json(send, status, payload):
+    await _send(send, status, json.dumps(payload).encode("utf-8"), b"application/json")
+
+
+class App:
+    """Minimal ASGI application; the service is created at startup, or on first request"""
+
+    def __init__(self):
+        self.service = None
+        self._loading = None
+
+    async def _service(self):
+        if self.service is None:
+            if self._loading is None:
+                self._loading = asyncio.get_running_loop().run_in_executor(None, RecommendationService)
+            try:
+                self.service = await self._loading
+            except Exception:
+                self._loading = None
+                raise
+        return self.service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            # Unknown paths share one stage so they cannot grow the metric set
+            path = scope["path"] if scope["path"] in PATHS else "other"
+            with stage(f"api {scope['method']} {path}"):
+                try:
+                    status, payload = await self._handle(scope, receive)
+                except HTTPError as e:
+                    status, payload = e.status, {"error": e.message}
+                if isinstance(payload, tuple):
+                    await _send(send, status, *payload)
+                else:
+                    await _send_json(send, status, payload)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await self._service()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _handle(self, scope, receive):
+        method, path = scope["method"], scope["path"]
+        service = await self._service()
+        loop = asyncio.get_running_loop()
+
+        if path == "/health" and method == "GET":
+            manifest = service.engine.manifest or {}
+            return 200, {"status": "ok", "movies": len(service.engine.titles), "model_version": manifest.get("version")}
+
+        if path == "/metrics" and method == "GET":
+            query = parse_qs(scope.get("query_string", b"").decode())
+            snapshot = TRACER.snapshot()
+            if query.get("format", [""])[0] == "jsonl":
+                return 200, (to_jsonl(snapshot, pid=os.getpid()).encode("utf-8"), b"application/x-ndjson")
+            return 200, (to_prometheus(snapshot).encode("utf-8"), b"text/plain; version=0.0.4")
+
+        if path == "/recommend" and method == "GET":
+            query = parse_qs(scope.get("query_string", b"").decode())
+            if "title" not in query:
+                raise HTTPError(400, "missing 'title' query parameter")
+            k = _parse_k(query.get("k", [10])[0])
+            results = await loop.run_in_executor(None, service.recommend, query["title"][:1], k)
+            result = results[0]
+            return (404 if "error" in result else 200), result
+
+        if path == "/recommend" and method == "POST":
+            payload = await _read_json(receive)
+            titles = _string_list(payload, "titles")
+            k = _parse_k(payload.get("k", 10))
+            results = await loop.run_in_executor(None, service.recommend, titles, k)
+            return 200, {"results": results}
+
+        if path == "/recommend/history" and method == "POST":
+            payload = await _read_json(receive)
+            titles = _string_list(payload, "titles")
+            dislikes = _string_list(payload, "dislikes") if "dislikes" in payload else []
+            weights = payload.get("weights")
+            if weights is not None and (
+                not isinstance(weights, list) or len(weights) != len(titles)
+                or not all(isinstance(weight, (int, float)) for weight in weights)
+            ):
+                raise HTTPError(400, "'weights' must be a list of numbers, one per title")
+            k = _parse_k(payload.get("k", 10))
+            recommendations = await loop.run_in_executor(
+                None, service.recommend_from_history, titles, weights, dislikes, k
+            )
+            return 200, {"recommendations": recommendations}
+
+        if path == "/sentiment" and method == "POST":
+            reviews = _string_list(await _read_json(receive), "reviews")
+            results = await loop.run_in_executor(None, service.sentiment, reviews)
+            return 200, {"results": results}
+
+        if path in PATHS:
+            raise HTTPError(405, "method not allowed")
+        raise HTTPError(404, "not found")
+
+
+app = App()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("api:app", host="0.0.0.0", port=int(os.environ.get("PORT", 8000)),
+                workers=int(os.environ.get("WEB_CONCURRENCY", 1)))
@@ -0,0 +1,95 @@
+"""Recall@10 and query latency of the IVF neighbor index against exact search
+
+Run from the repository root: python benchmarks/bench_ann.py --rows 6010 100000 500000
+
+6010 uses main_data.csv itself; other sizes use a synthetic catalog built the
+same way. Recall counts an approximate result as correct when its cosine is
+at least the exact 10th-best score, so ties at the boundary are not misses.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from movie_recommender.neighbor_index import ExactIndex, IVFIndex  # noqa: E402
+from movie_recommender.similarity_engine import build_feature_matrix, top_k  # noqa: E402
+from synthetic_catalog import make_catalog  # noqa: E402
+
+N_PROBES = [4, 8, 16, 32]
+K = 10
+
+
+def timed_queries(query, queries):
+    latencies, results = [], []
+    for row in queries:
+        start = time.perf_counter()
+        results.append(query(row))
+        latencies.append(time.perf_counter() - start)
+    return np.array(results), np.array(latencies) * 1000
+
+
+def print_row(name, build, recall_at_k, latencies, candidates):
+    print(f"{name:<24}{build:>9.1f}{recall_at_k:>11.3f}{np.percentile(latencies, 50):>9.2f}"
+          f"{np.percentile(latencies, 99):>9.2f}{candidates:>12.0f}")
+
+
+def recall(features, queries, exact, approx):
+    hits = 0
+    for row, truth, found in zip(queries, exact, approx):
+        scores = (features[row] @ features.T).toarray().ravel()
+        threshold = scores[truth[-1]]
+        found = found[found >= 0]
+        hits += min(int((scores[found] >= threshold).sum()), K)
+    return hits / (K * len(queries))
+
+
+def report(n_rows, n_queries, n_lists):
+    data = pd.read_csv("main_data.csv") if n_rows == 6010 else make_catalog(n_rows)
+    start = time.perf_counter()
+    features, _ = build_feature_matrix(data["comb"])
+    print(f"\n{n_rows} rows x {features.shape[1]} terms (features in {time.perf_counter() - start:.1f}s)")
+    queries = np.random.default_rng(1).choice(n_rows, n_queries, replace=False)
+    print(f"{'index':<24}{'build s':>9}{'recall@10':>11}{'p50 ms':>9}{'p99 ms':>9}{'candidates':>12}")
+
+    # The engine's on-demand path before the index: one product with the whole catalog
+    full, latencies = timed_queries(lambda row: top_k((features[row] @ features.T).toarray().ravel(), K, {row}),
+                                    queries)
+    print_row("full product", 0, 1, latencies, n_rows)
+
+    start = time.perf_counter()
+    index = ExactIndex(features)
+    build = time.perf_counter() - start
+    exact, latencies = timed_queries(lambda row: index.query([row], K)[0], queries)
+    assert np.array_equal(exact, full), "exact index disagrees with the full product"
+    print_row("exact", build, 1, latencies, n_rows)
+
+    start = time.perf_counter()
+    index = IVFIndex(features, n_lists=n_lists)
+    build = time.perf_counter() - start
+    for n_probe in N_PROBES:
+        index.n_probe = n_probe
+        approx, latencies = timed_queries(lambda row: index.query([row], K)[0], queries)
+        candidates = np.mean([len(index.candidates(row)) for row in queries])
+        print_row(f"ivf {index.n_lists} lists, {n_probe} probes", build, recall(features, queries, exact, approx),
+                  latencies, candidates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[6010, 100000])
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--lists", type=int, help="IVF lists (default: square root of the rows)")
+    args = parser.parse_args()
+
+    for n_rows in args.rows:
+        report(n_rows, args.queries, args.lists)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Import and cold-start time of the movie_recommender core, each measured in a fresh interpreter
+
+Run from the repository root: python benchmarks/bench_import.py
+
+Also lists which heavy dependencies each step pulled in, and fails if any
+of them imported Streamlit.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ["streamlit", "sklearn", "pandas", "scipy", "requests", "lxml"]
+STEPS = [
+    ("import movie_recommender", "import movie_recommender"),
+    ("import model_store", "import movie_recommender.model_store"),
+    ("import service", "import movie_recommender.service"),
+    ("import tmdb_client", "import movie_recommender.tmdb_client"),
+    ("import reviews", "import movie_recommender.reviews"),
+    ("load model + 1 query", "from movie_recommender import load_engine\n"
+                             "load_engine().recommend(['avatar'], 10)"),
+]
+
+TEMPLATE = """
+import json, sys, time
+start = time.perf_counter()
+{code}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "modules": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def measure(code, repeat):
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", TEMPLATE.format(code=code, heavy=HEAVY_MODULES)],
+                                capture_output=True, text=True, check=True, cwd=ROOT).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return min(run["seconds"] for run in runs), runs[0]["modules"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per step; the fastest is reported")
+    args = parser.parse_args()
+
+    print(f"{'step':<24}{'seconds':>9}  heavy modules loaded")
+    for name, code in STEPS:
+        seconds, modules = measure(code, args.repeat)
+        print(f"{name:<24}{seconds:>9.3f}  {', '.join(modules) or '-'}")
+        assert "streamlit" not in modules, f"{name} imported Streamlit"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Peak memory and time to turn a catalog CSV into the feature matrix: pandas + comb vs chunked ingestion
+
+Run from the repository root: python benchmarks/bench_ingest.py --rows 6010 100000 1000000
+
+6010 uses main_data.csv itself; other sizes write a synthetic catalog to
+--workdir first. Every measurement runs in a fresh process so peak RSS is
+not shared between them.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+MODES = ["dataframe", "catalog"]
+
+
+def peak_rss_mb():
+    # VmHWM is this process's own high-water mark; ru_maxrss can carry over
+    # the peak of the process that spawned it
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def measure(mode, csv_path):
+    import pandas as pd
+
+    from movie_recommender.catalog import read_catalog
+    from movie_recommender.similarity_engine import build_feature_matrix
+
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if mode == "dataframe":
+        # The previous path: every column as Python strings, comb included
+        data = pd.read_csv(csv_path)
+        features, _ = build_feature_matrix(data["comb"])
+    else:
+        catalog = read_catalog(csv_path)
+        features, _ = catalog.feature_matrix()
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"seconds": elapsed, "peak_mb": peak_rss_mb(), "baseline_mb": baseline,
+                      "nnz": int(features.nnz)}))
+
+
+def catalog_csv(n_rows, workdir):
+    if n_rows == 6010:
+        return os.path.join(ROOT, "main_data.csv")
+    path = os.path.join(workdir, f"catalog_{n_rows}.csv")
+    if not os.path.exists(path):
+        from synthetic_catalog import write_catalog
+
+        write_catalog(path, n_rows)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[6010, 100000, 1000000])
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "movie_catalogs"))
+    parser.add_argument("--measure", nargs=2, metavar=("MODE", "CSV"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(*args.measure)
+        return
+
+    os.makedirs(args.workdir, exist_ok=True)
+    print(f"{'rows':>9}  {'mode':<10}{'seconds':>9}{'peak MB':>10}{'ingest MB':>11}")
+    for n_rows in args.rows:
+        csv_path = catalog_csv(n_rows, args.workdir)
+        nnz = set()
+        for mode in MODES:
+            output = subprocess.run([sys.executable, __file__, "--measure", mode, csv_path],
+                                    capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            nnz.add(result["nnz"])
+            print(f"{n_rows:>9}  {mode:<10}{result['seconds']:>9.2f}{result['peak_mb']:>10.0f}"
+                  f"{result['peak_mb'] - result['baseline_mb']:>11.0f}")
+        assert len(nnz) == 1, "the two paths built different matrices"
+
+
+if __name__ == "__main__":
+    main()
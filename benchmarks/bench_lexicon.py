@@ -0,0 +1,79 @@
+"""Keyword sentiment throughput: compiled lexicon engine vs the original substring scan
+
+Run from the repository root: python benchmarks/bench_lexicon.py
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from movie_recommender.sentiment import NEGATIVE_WORDS, NEGATORS, POSITIVE_WORDS, keyword_sentiments  # noqa: E402
+
+
+def legacy_simple_sentiment_analysis(text):
+    """The keyword fallback as it was in streamlit_app.py, kept for comparison"""
+    positive_words = ['good', 'great', 'excellent', 'amazing', 'awesome', 'fantastic', 'wonderful', 'brilliant', 'perfect', 'outstanding', 'superb', 'magnificent', 'incredible', 'spectacular', 'marvelous', 'love', 'loved', 'like', 'enjoy', 'enjoyed', 'best', 'better', 'beautiful', 'stunning', 'impressive', 'remarkable', 'extraordinary']
+    negative_words = ['bad', 'terrible', 'awful', 'horrible', 'worst', 'hate', 'hated', 'boring', 'disappointing', 'poor', 'weak', 'stupid', 'ridiculous', 'pathetic', 'waste', 'sucks', 'sucked', 'disgusting', 'annoying', 'irritating', 'frustrating', 'mediocre', 'bland', 'dull', 'confusing']
+
+    text_lower = text.lower()
+    positive_count = sum(1 for word in positive_words if word in text_lower)
+    negative_count = sum(1 for word in negative_words if word in text_lower)
+
+    if positive_count > negative_count:
+        return 'Positive'
+    elif negative_count > positive_count:
+        return 'Negative'
+    else:
+        return 'Neutral'
+
+
+def synthetic_reviews(n_reviews, words_per_review, sentiment_rate=0.05, negation_rate=0.02, seed=0):
+    """Reviews drawn from catalog names with a realistic sprinkling of sentiment words and negations"""
+    rng = random.Random(seed)
+    filler = pd.read_csv("main_data.csv", usecols=["comb"])["comb"].str.lower().str.split().explode().unique().tolist()
+    filler += "the movie plot was and a of to it with this that is in".split() * 50
+    lexicon = sorted(POSITIVE_WORDS | NEGATIVE_WORDS)
+    negators = sorted(NEGATORS) + ["didn't", "isn't", "wasn't"]
+
+    def word():
+        roll = rng.random()
+        if roll < sentiment_rate:
+            choice = rng.choice(lexicon)
+        elif roll < sentiment_rate + negation_rate:
+            choice = rng.choice(negators)
+        else:
+            choice = rng.choice(filler)
+        return choice + ("." if rng.random() < 0.08 else "")
+
+    return [" ".join(word() for _ in range(words_per_review)) for _ in range(n_reviews)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reviews", type=int, default=1000)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[40, 120, 400], help="Words per review")
+    args = parser.parse_args()
+
+    print(f"{'words':>6} {'legacy ms/1k':>13} {'engine ms/1k':>13} {'ratio':>6} {'agreement':>10}")
+    for length in args.lengths:
+        reviews = synthetic_reviews(args.reviews, length)
+
+        start = time.perf_counter()
+        legacy = [legacy_simple_sentiment_analysis(review) for review in reviews]
+        legacy_ms = (time.perf_counter() - start) * 1000 * 1000 / args.reviews
+
+        start = time.perf_counter()
+        labels = keyword_sentiments(reviews)
+        engine_ms = (time.perf_counter() - start) * 1000 * 1000 / args.reviews
+
+        agreement = sum(a == b for a, b in zip(legacy, labels)) / len(reviews)
+        print(f"{length:>6} {legacy_ms:>13.1f} {engine_ms:>13.1f} {legacy_ms / engine_ms:>6.2f} {agreement:>10.1%}")
+
+
+if __name__ == "__main__":
+    main()
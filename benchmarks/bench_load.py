@@ -0,0 +1,228 @@
+"""Throughput, page latency, memory and outbound calls of the Streamlit app under N concurrent users
+
+Run from the repository root: python benchmarks/bench_load.py --users 1 8 32 --workers 2 --latency-ms 80
+
+TMDb and IMDb are replaced by the local stubs in stub_servers.py (replaying
+--recordings if given, with the given latency), so nothing leaves the host.
+Each worker is a process that imports streamlit_app in bare mode, as one
+Streamlit server process would, and runs its share of the users as
+threads, the way Streamlit runs sessions. A user opens a movie's page the
+way main and display_movie_details build it (recommendations, TMDb details
+and cast, recommendation posters, then waiting for the IMDb reviews),
+then either follows one of its recommendations (--follow) or picks a new
+title, with popular titles picked more often (--zipf). Widgets are not
+rendered.
+
+Every run starts with empty caches. Pages/s and latency percentiles cover
+all workers. Memory is per worker, the largest over the workers: its
+peak RSS once the model and sentiment models are loaded, and over the
+whole run. Outbound calls are the requests each stub served.
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_ingest import peak_rss_mb  # noqa: E402
+from bench_pipeline import latency_stats  # noqa: E402
+from stub_servers import load_recordings, start_stubs, stub_environment  # noqa: E402
+
+API_KEY = "stub-api-key-0123456789abcdef"
+FOLLOW = 0.5
+ZIPF = 1.0
+
+
+def open_page(app, engine, title):
+    """Build title's page like main and display_movie_details
+
+    Returns the outcome ('ok', 'not_found', 'no_details' or
+    'reviews_timeout') and the recommendations.
+    """
+    recommendations = app.get_movie_recommendations(title, engine)
+    if isinstance(recommendations, str):
+        return "not_found", []
+    page = app.get_page_data(title, recommendations, API_KEY)
+    if page is None:
+        return "no_details", recommendations
+    imdb_id = page["movie_details"].get("imdb_id")
+    if imdb_id:
+        try:
+            app.get_review_pipeline().submit(imdb_id).result(timeout=app.REVIEW_WAIT_SECONDS)
+        except FutureTimeoutError:
+            return "reviews_timeout", recommendations
+    return "ok", recommendations
+
+
+def run_user(app, engine, titles, weights, deadline, follow, seed, results):
+    rng = np.random.default_rng(seed)
+    latencies, outcomes = [], {}
+    title = titles[rng.choice(len(titles), p=weights)]
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            outcome, recommendations = open_page(app, engine, title)
+        except Exception:
+            outcome, recommendations = "error", []
+        latencies.append(time.perf_counter() - start)
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        if recommendations and rng.random() < follow:
+            # View Details on one of the five recommendations with a poster
+            title = recommendations[rng.integers(min(5, len(recommendations)))]
+        else:
+            title = titles[rng.choice(len(titles), p=weights)]
+    results.append((latencies, outcomes))
+
+
+def measure_worker(n_users, duration, follow, zipf, seed):
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    os.chdir(ROOT)
+    import streamlit_app as app
+    from movie_recommender.tracing import TRACER
+
+    engine = app.load_current_engine()
+    app.get_review_pipeline()
+    loaded_mb = peak_rss_mb()
+
+    # The titles as the search box lists them, the most popular first
+    titles = sorted(movie.title() for movie in engine.titles.active_titles())
+    order = np.random.default_rng(0).permutation(len(titles))
+    titles = [titles[i] for i in order]
+    weights = 1 / np.arange(1, len(titles) + 1) ** zipf
+    weights /= weights.sum()
+
+    results = []
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=run_user, args=(app, engine, titles, weights, deadline, follow, seed + user, results))
+        for user in range(n_users)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    snapshot = TRACER.snapshot()
+    outcomes = {}
+    for _, user_outcomes in results:
+        for outcome, n in user_outcomes.items():
+            outcomes[outcome] = outcomes.get(outcome, 0) + n
+    return {
+        "latencies": [seconds for latencies, _ in results for seconds in latencies],
+        "outcomes": outcomes,
+        "loaded_mb": loaded_mb,
+        "peak_mb": peak_rss_mb(),
+        "counters": snapshot["counters"],
+        "gauges": {name: value for name, value in snapshot["gauges"].items() if name.startswith("result_cache")},
+    }
+
+
+def run_workers(n_users, n_workers, duration, follow, zipf, environment):
+    # Users are dealt out to the workers as a load balancer would spread sessions
+    shares = [n_users // n_workers + (i < n_users % n_workers) for i in range(n_workers)]
+    processes = [
+        subprocess.Popen([sys.executable, __file__, "--measure", str(share), str(duration), str(follow), str(zipf),
+                          str(1000 * i)], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                         env=dict(os.environ, **environment))
+        for i, share in enumerate(shares) if share
+    ]
+    results = []
+    for process in processes:
+        output, errors = process.communicate()
+        if process.returncode:
+            raise RuntimeError(f"worker exited with status {process.returncode}:\n{errors[-2000:]}")
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+
+def summarize(n_users, workers, duration, tmdb_calls, imdb_calls):
+    latencies = [seconds for worker in workers for seconds in worker["latencies"]]
+    outcomes = {}
+    for worker in workers:
+        for outcome, n in worker["outcomes"].items():
+            outcomes[outcome] = outcomes.get(outcome, 0) + n
+    pages = len(latencies)
+    return {
+        "users": n_users,
+        "workers": len(workers),
+        "pages": pages,
+        "pages_per_second": pages / duration,
+        "latency": latency_stats(latencies) if latencies else None,
+        "outcomes": outcomes,
+        "worker_peak_mb": [worker["peak_mb"] for worker in workers],
+        "worker_loaded_mb": [worker["loaded_mb"] for worker in workers],
+        "tmdb_calls": tmdb_calls,
+        "imdb_calls": imdb_calls,
+        "calls_per_page": (sum(tmdb_calls.values()) + sum(imdb_calls.values())) / max(pages, 1),
+        "result_cache": [worker["gauges"] for worker in workers],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 8, 32], help="Concurrent users per run")
+    parser.add_argument("--workers", type=int, default=1, help="App processes the users are spread over")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds each run lasts")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Stub TMDb response latency")
+    parser.add_argument("--imdb-latency-ms", type=float, help="Stub IMDb response latency (default: --latency-ms)")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Random extra stub latency, up to this much")
+    parser.add_argument("--recordings", help="Recorded TMDb/IMDb responses to replay (see stub_servers.py)")
+    parser.add_argument("--follow", type=float, default=FOLLOW, help="Chance a user opens a recommendation next")
+    parser.add_argument("--zipf", type=float, default=ZIPF, help="Popularity skew of picked titles (0 for uniform)")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    parser.add_argument("--measure", nargs=5, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        n_users, duration, follow, zipf, seed = args.measure
+        print(json.dumps(measure_worker(int(n_users), float(duration), float(follow), float(zipf), int(seed))))
+        return
+
+    tmdb, imdb = start_stubs(load_recordings(args.recordings), args.latency_ms, args.jitter_ms, args.imdb_latency_ms)
+    runs = []
+    print(f"{os.cpu_count()} CPUs, {args.workers} workers, {args.duration:.0f}s per run, "
+          f"stub latency {args.latency_ms:.0f} ms")
+    print(f"{'users':>6}{'pages/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}{'loaded MB':>11}"
+          f"{'peak MB':>9}{'TMDb':>7}{'IMDb':>7}{'calls/page':>12}")
+    try:
+        for n_users in args.users:
+            with tempfile.TemporaryDirectory() as cache_dir:
+                # A fresh TMDb cache per run, shared by its workers as on one host
+                environment = dict(stub_environment(tmdb, imdb),
+                                   TMDB_CACHE_PATH=os.path.join(cache_dir, "tmdb_cache.sqlite"))
+                tmdb.reset_counts()
+                imdb.reset_counts()
+                workers = run_workers(n_users, args.workers, args.duration, args.follow, args.zipf, environment)
+                run = summarize(n_users, workers, args.duration, tmdb.reset_counts(), imdb.reset_counts())
+            runs.append(run)
+            latency = run["latency"] or {"p50_ms": 0, "p95_ms": 0, "p99_ms": 0}
+            errors = sum(n for outcome, n in run["outcomes"].items() if outcome != "ok")
+            print(f"{n_users:>6}{run['pages_per_second']:>9.1f}{latency['p50_ms']:>9.1f}{latency['p95_ms']:>9.1f}"
+                  f"{latency['p99_ms']:>9.1f}{errors:>8}{max(run['worker_loaded_mb']):>11.0f}"
+                  f"{max(run['worker_peak_mb']):>9.0f}{sum(run['tmdb_calls'].values()):>7}"
+                  f"{sum(run['imdb_calls'].values()):>7}{run['calls_per_page']:>12.2f}")
+    finally:
+        tmdb.stop()
+        imdb.stop()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "cpus": os.cpu_count(),
+                       "settings": {name: value for name, value in vars(args).items() if name != "measure"},
+                       "runs": runs}, f, indent=1)
+        print(f"✅ Wrote results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Time and peak memory of the all-pairs neighbor table build by catalog size and worker count
+
+Run from the repository root: python benchmarks/bench_neighbors.py --rows 6010 50000 100000 --workers 1 2 4
+
+6010 uses main_data.csv itself; other sizes write a synthetic catalog to
+--workdir first. Field features for each catalog are computed once and
+saved next to it, so every measurement only times the table. Each one runs
+in a fresh process; worker MB is the largest peak of any pool worker.
+--fixed-block also times the previous fixed 1024-row blocks, whose dense
+scores grow with the catalog.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_ingest import catalog_csv, peak_rss_mb  # noqa: E402
+
+K = 50
+FIXED_BLOCK = 1024
+
+
+def features_path(n_rows, workdir):
+    path = os.path.join(workdir, f"features_{n_rows}.npz")
+    if not os.path.exists(path):
+        from scipy import sparse
+
+        from movie_recommender.catalog import read_catalog
+        from movie_recommender.field_features import FieldVectorizer
+
+        features, _ = FieldVectorizer().fit_transform(read_catalog(catalog_csv(n_rows, workdir)))
+        sparse.save_npz(path, features)
+    return path
+
+
+def measure(path, workers, memory_mb, block_size):
+    from scipy import sparse
+
+    from movie_recommender.similarity_engine import build_neighbor_table, neighbor_block_size
+
+    features = sparse.load_npz(path).tocsr()
+    baseline = peak_rss_mb()
+    block_size = block_size or neighbor_block_size(features.shape[0], memory_mb << 20, workers)
+    start = time.perf_counter()
+    build_neighbor_table(features, K, block_size, workers=workers)
+    return {
+        "seconds": time.perf_counter() - start,
+        "block_size": block_size,
+        "peak_mb": peak_rss_mb(),
+        "baseline_mb": baseline,
+        "worker_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[6010, 50000])
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, os.cpu_count() or 1}))
+    parser.add_argument("--memory-mb", type=int, default=512, help="Budget shared by the workers")
+    parser.add_argument("--fixed-block", action="store_true", help="Also time 1024-row blocks on one worker")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "movie_catalogs"))
+    parser.add_argument("--measure", nargs=4, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        path, workers, memory_mb, block_size = args.measure
+        print(json.dumps(measure(path, int(workers), int(memory_mb), int(block_size))))
+        return
+
+    os.makedirs(args.workdir, exist_ok=True)
+    print(f"{os.cpu_count()} CPUs, {args.memory_mb} MB budget")
+    print(f"{'rows':>9}{'workers':>9}{'block':>7}{'seconds':>9}{'speedup':>9}{'peak MB':>9}{'table MB':>10}"
+          f"{'worker MB':>11}")
+    for n_rows in args.rows:
+        path = features_path(n_rows, args.workdir)
+        runs = [(workers, 0) for workers in args.workers] + ([(1, FIXED_BLOCK)] if args.fixed_block else [])
+        serial = None
+        for workers, block_size in runs:
+            output = subprocess.run([sys.executable, __file__, "--measure", path, str(workers), str(args.memory_mb),
+                                     str(block_size)], capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            if workers == 1 and not block_size:
+                serial = result["seconds"]
+            speedup = f"{serial / result['seconds']:.2f}x" if serial else "-"
+            worker_mb = f"{result['worker_mb']:.0f}" if workers > 1 else "-"
+            print(f"{n_rows:>9}{workers:>9}{result['block_size']:>7}{result['seconds']:>9.2f}{speedup:>9}"
+                  f"{result['peak_mb']:>9.0f}{result['peak_mb'] - result['baseline_mb']:>10.0f}{worker_mb:>11}")
+
+
+if __name__ == "__main__":
+    main()
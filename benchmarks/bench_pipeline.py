@@ -0,0 +1,269 @@
+"""Build, load, query and review-scoring benchmark of the recommendation pipeline, with a golden top-10 check
+
+Run from the repository root: python benchmarks/bench_pipeline.py --rows 6010 100000 --output results.json
+
+Nothing here needs Streamlit or the network. For each catalog size the
+model is built in one fresh process and loaded and queried in another,
+so peak RSS and the load time are those of a process starting cold.
+6010 uses main_data.csv itself; other sizes write a synthetic catalog to
+--workdir first. Reviews are parsed from a synthetic IMDb page and scored
+with the bundled sentiment model, after checking that the saved page in
+benchmarks/fixtures/imdb_reviews.html still parses to the reviews listed
+in imdb_reviews.json.
+
+Top-10 lists for a fixed sample of titles are compared with the golden
+baseline in --golden (benchmarks/golden_top10.json by default), as the
+mean share of each list the baseline also has. --write-golden replaces
+the baseline with this run's lists. The JSON written to --output can be
+passed to --compare in a later run to print the relative change of every
+timing.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_ingest import catalog_csv, peak_rss_mb  # noqa: E402
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden_top10.json")
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+K = 10
+GOLDEN_QUERIES = 200
+REVIEW_PAGES = 50
+REVIEWS_PER_PAGE = 10
+
+
+def latency_stats(seconds):
+    milliseconds = np.asarray(seconds) * 1000
+    return {
+        "p50_ms": float(np.percentile(milliseconds, 50)),
+        "p95_ms": float(np.percentile(milliseconds, 95)),
+        "p99_ms": float(np.percentile(milliseconds, 99)),
+        "mean_ms": float(milliseconds.mean()),
+    }
+
+
+def sample_titles(engine, n_titles, seed=0):
+    # Titles that resolve to their own row, so each query is unambiguous
+    titles = engine.titles
+    rows = [row for row in range(len(titles.titles)) if titles.resolve(titles[row]) == row]
+    picked = np.random.default_rng(seed).choice(len(rows), min(n_titles, len(rows)), replace=False)
+    return [titles[rows[i]] for i in sorted(picked.tolist())]
+
+
+def measure_build(csv_path, model_dir, n_neighbors, index):
+    from movie_recommender.model_store import build_engine
+
+    start = time.perf_counter()
+    engine = build_engine(csv_path, model_dir, n_neighbors, index)
+    return {
+        "seconds": time.perf_counter() - start,
+        "peak_mb": peak_rss_mb(),
+        "movies": len(engine),
+        "terms": engine.features.shape[1],
+        "nnz": int(engine.features.nnz),
+    }
+
+
+def measure_query(model_dir, n_queries, batch_size):
+    from movie_recommender.model_store import load_engine
+
+    start = time.perf_counter()
+    engine = load_engine(model_dir)
+    load_seconds = time.perf_counter() - start
+    load_peak = peak_rss_mb()
+
+    # The app's path: resolve one title, then rank its neighbors
+    titles = sample_titles(engine, n_queries, seed=1)
+    single = []
+    for title in titles:
+        start = time.perf_counter()
+        engine.recommend([title], K)
+        single.append(time.perf_counter() - start)
+
+    # Bypasses the neighbor table, as queries for movies outside it would
+    rows = [engine.titles.resolve(title) for title in titles]
+    neighbors, engine.neighbors = engine.neighbors, None
+    batches = []
+    for start_row in range(0, len(rows), batch_size):
+        start = time.perf_counter()
+        engine.similar_batch(rows[start_row:start_row + batch_size], K)
+        batches.append(time.perf_counter() - start)
+    engine.neighbors = neighbors
+
+    golden_titles = sample_titles(engine, GOLDEN_QUERIES)
+    return {
+        "load_seconds": load_seconds,
+        "load_peak_mb": load_peak,
+        "single": latency_stats(single),
+        "batch": dict(latency_stats(batches), size=batch_size),
+        "on_demand_per_query_ms": 1000 * sum(batches) / max(len(rows), 1),
+        "peak_mb": peak_rss_mb(),
+        "top10": dict(zip(golden_titles, engine.recommend(golden_titles, K))),
+    }
+
+
+def review_page(texts):
+    from movie_recommender.reviews import REVIEW_CLASS
+
+    divs = "".join(f'<div class="review"><div class="{REVIEW_CLASS}">{text}</div></div>' for text in texts)
+    return f"<html><body>{divs}</body></html>".encode("utf-8")
+
+
+def check_review_fixture():
+    """Assert the saved IMDb reviews page parses to the texts recorded next to it"""
+    from movie_recommender.reviews import parse_reviews
+
+    with open(os.path.join(FIXTURES, "imdb_reviews.html"), "rb") as f:
+        page = f.read()
+    with open(os.path.join(FIXTURES, "imdb_reviews.json"), encoding="utf-8") as f:
+        expected = json.load(f)
+    assert parse_reviews(page) == expected, "the saved IMDb page no longer parses to its recorded reviews"
+    assert parse_reviews(page, limit=2) == expected[:2], "parse_reviews did not stop at the limit"
+
+
+def measure_reviews(n_pages):
+    from bench_sentiment import synthetic_reviews
+    from movie_recommender.reviews import ReviewPipeline, parse_reviews
+    from movie_recommender.sentiment import SentimentScorer, load_sentiment_models
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        nlp_model, vectorizer = load_sentiment_models(os.path.join(ROOT, "nlp_model.pkl"),
+                                                      os.path.join(ROOT, "tranform.pkl"))
+    check_review_fixture()
+    pipeline = ReviewPipeline(SentimentScorer(nlp_model, vectorizer), max_workers=1)
+    texts = synthetic_reviews(vectorizer, n_pages * REVIEWS_PER_PAGE)
+    pages = [review_page(texts[i:i + REVIEWS_PER_PAGE]) for i in range(0, len(texts), REVIEWS_PER_PAGE)]
+
+    # What ReviewPipeline does for one movie once the page has been fetched
+    seconds = []
+    for page in pages:
+        start = time.perf_counter()
+        scored = pipeline.score(parse_reviews(page))
+        seconds.append(time.perf_counter() - start)
+    assert len(scored) == REVIEWS_PER_PAGE, "the synthetic page did not parse"
+    return dict(latency_stats(seconds), pages=n_pages, reviews_per_page=REVIEWS_PER_PAGE, peak_mb=peak_rss_mb())
+
+
+def run_stage(*args):
+    output = subprocess.run([sys.executable, __file__, "--measure", *map(str, args)],
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def overlap(top10, golden):
+    shared = [title for title in top10 if title in golden]
+    if not shared:
+        return None
+    return float(np.mean([len(set(top10[title] or ()) & set(golden[title] or ())) / K for title in shared]))
+
+
+def compare(results, previous):
+    print(f"\nchange against {previous['created_at']}")
+    for size, run in results["catalogs"].items():
+        old = previous["catalogs"].get(size)
+        if old is None:
+            continue
+        for name, new_value, old_value in [
+            ("build s", run["build"]["seconds"], old["build"]["seconds"]),
+            ("load s", run["query"]["load_seconds"], old["query"]["load_seconds"]),
+            ("single p50", run["query"]["single"]["p50_ms"], old["query"]["single"]["p50_ms"]),
+            ("single p99", run["query"]["single"]["p99_ms"], old["query"]["single"]["p99_ms"]),
+            ("batch p50", run["query"]["batch"]["p50_ms"], old["query"]["batch"]["p50_ms"]),
+            ("peak MB", run["build"]["peak_mb"], old["build"]["peak_mb"]),
+        ]:
+            print(f"{size:>9}  {name:<12}{old_value:>10.2f} ->{new_value:>10.2f}  {new_value / old_value - 1:+7.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[6010])
+    parser.add_argument("--queries", type=int, default=500, help="Titles timed per catalog")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--neighbors", type=int, default=50, help="Neighbor table width (0 to skip the table)")
+    parser.add_argument("--index", default="exact", help="Neighbor index kind ('exact' or 'ivf')")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "movie_catalogs"))
+    parser.add_argument("--golden", default=GOLDEN_PATH)
+    parser.add_argument("--write-golden", action="store_true", help="Save this run's top-10 lists as the baseline")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    parser.add_argument("--compare", metavar="JSON", help="Results of an earlier run to compare against")
+    parser.add_argument("--measure", nargs="+", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        stage, *params = args.measure
+        if stage == "build":
+            result = measure_build(params[0], params[1], int(params[2]), params[3])
+        elif stage == "query":
+            result = measure_query(params[0], int(params[1]), int(params[2]))
+        else:
+            result = measure_reviews(int(params[0]))
+        print(json.dumps(result))
+        return
+
+    golden = {}
+    if os.path.exists(args.golden):
+        with open(args.golden, encoding="utf-8") as f:
+            golden = json.load(f)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    results = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "cpus": os.cpu_count(),
+        "settings": {"queries": args.queries, "batch_size": args.batch_size, "neighbors": args.neighbors,
+                     "index": args.index},
+        "catalogs": {},
+    }
+    print(f"{'rows':>9}{'build s':>9}{'build MB':>10}{'load s':>8}{'load MB':>9}{'p50 ms':>8}{'p99 ms':>8}"
+          f"{'batch p50':>11}{'batch p99':>11}{'top-10':>8}")
+    with tempfile.TemporaryDirectory() as model_root:
+        for n_rows in args.rows:
+            csv_path = catalog_csv(n_rows, args.workdir)
+            model_dir = os.path.join(model_root, str(n_rows))
+            build = run_stage("build", csv_path, model_dir, args.neighbors, args.index)
+            query = run_stage("query", model_dir, args.queries, args.batch_size)
+            top10 = query.pop("top10")
+            agreement = overlap(top10, golden.get(str(n_rows), {}))
+            results["catalogs"][str(n_rows)] = {"build": build, "query": query, "golden_overlap": agreement,
+                                                "top10": top10}
+            if args.write_golden:
+                golden[str(n_rows)] = top10
+            print(f"{n_rows:>9}{build['seconds']:>9.2f}{build['peak_mb']:>10.0f}{query['load_seconds']:>8.2f}"
+                  f"{query['load_peak_mb']:>9.0f}{query['single']['p50_ms']:>8.2f}{query['single']['p99_ms']:>8.2f}"
+                  f"{query['batch']['p50_ms']:>11.2f}{query['batch']['p99_ms']:>11.2f}"
+                  f"{'-' if agreement is None else format(agreement, '.3f'):>8}")
+
+    results["reviews"] = run_stage("reviews", REVIEW_PAGES)
+    reviews = results["reviews"]
+    print(f"reviews: {reviews['pages']} pages of {reviews['reviews_per_page']}, parse + score "
+          f"p50 {reviews['p50_ms']:.2f} ms, p99 {reviews['p99_ms']:.2f} ms")
+
+    if args.write_golden:
+        with open(args.golden, "w", encoding="utf-8") as f:
+            json.dump(golden, f, indent=1, sort_keys=True)
+        print(f"✅ Wrote golden top-10 lists to {args.golden}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1)
+        print(f"✅ Wrote results to {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
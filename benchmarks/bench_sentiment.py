@@ -0,0 +1,56 @@
+"""Per-review vs batched sentiment scoring throughput with the bundled models
+
+Run from the repository root: python benchmarks/bench_sentiment.py
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from movie_recommender.sentiment import SentimentScorer, load_sentiment_models  # noqa: E402
+
+
+def synthetic_reviews(vectorizer, n_reviews, words_per_review=120, seed=0):
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array(sorted(vectorizer.vocabulary_))
+    return [" ".join(rng.choice(vocabulary, words_per_review)) for _ in range(n_reviews)]
+
+
+def per_review(nlp_model, vectorizer, reviews):
+    return ["Positive" if nlp_model.predict(vectorizer.transform([review]))[0] else "Negative" for review in reviews]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reviews", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        nlp_model, vectorizer = load_sentiment_models()
+    scorer = SentimentScorer(nlp_model, vectorizer, args.batch_size)
+    reviews = synthetic_reviews(vectorizer, args.reviews)
+
+    start = time.perf_counter()
+    expected = per_review(nlp_model, vectorizer, reviews)
+    row_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    labels = [label for batch, _ in scorer.score_batches(reviews) for label in batch]
+    batch_seconds = time.perf_counter() - start
+
+    assert labels == expected, "batched labels differ from per-review predictions"
+    print(f"reviews:     {args.reviews}")
+    print(f"per-review:  {args.reviews / row_seconds:10.0f} reviews/s")
+    print(f"batched:     {args.reviews / batch_seconds:10.0f} reviews/s  (batch size {args.batch_size})")
+    print(f"speedup:     {row_seconds / batch_seconds:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
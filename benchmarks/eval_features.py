@@ -0,0 +1,129 @@
+"""Offline comparison of the comb bag of words with the weighted field features
+
+Run from the repository root: python benchmarks/eval_features.py
+
+There are no user ratings to score against, so neighbors are judged by
+held-out fields: each query movie is vectorized without its director (or
+lead actor), and a hit is a top-10 neighbor by that same director (or with
+that actor anywhere in its cast). A model that ranks movies well without
+being told the answer has learned which people and genres go together.
+'name only' is the share of top-10 neighbors that have no person and no
+genre in common with the query, i.e. matched on a shared first name or
+'unknown' alone.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from movie_recommender.catalog import MISSING_VALUE, read_catalog  # noqa: E402
+from movie_recommender.field_features import FIELDS, WEIGHTINGS, FieldVectorizer  # noqa: E402
+from movie_recommender.similarity_engine import FEATURE_COLUMNS, build_neighbor_table, top_k, vectorize  # noqa: E402
+
+K = 10
+ACTOR_COLUMNS = FIELDS["actor"]
+
+
+class CombModel:
+    """The existing model: CountVectorizer over the comb column"""
+
+    name = "comb"
+
+    def fit(self, catalog):
+        return catalog.feature_matrix()
+
+    def queries(self, data, vocabulary):
+        # Hidden cells are dropped rather than written as 'unknown'
+        comb = data[FEATURE_COLUMNS].apply(lambda row: " ".join(row.dropna().astype(str)), axis=1)
+        return vectorize(list(comb), vocabulary)[0]
+
+
+class FieldModel:
+    def __init__(self, weighting, weights=None):
+        self.vectorizer = FieldVectorizer(weights, weighting)
+        custom = "".join(f" {field}={weight:g}" for field, weight in (weights or {}).items())
+        self.name = f"fields {weighting}{custom}"
+
+    def fit(self, catalog):
+        return self.vectorizer.fit_transform(catalog)
+
+    def queries(self, data, vocabulary):
+        return self.vectorizer.transform(data, vocabulary)[0]
+
+
+def people(data):
+    columns = ["director_name"] + ACTOR_COLUMNS
+    return [set(row) - {MISSING_VALUE} for row in data[columns].itertuples(index=False, name=None)]
+
+
+def held_out_recall(model, features, vocabulary, data, rows, hidden_column, match_columns):
+    masked = data.iloc[rows].copy()
+    masked[hidden_column] = np.nan
+    queries = model.queries(masked, vocabulary)[:, :features.shape[1]]
+    scores = (queries @ features.T).toarray()
+    top = top_k(scores, K, [{row} for row in rows])
+    answers = data[hidden_column].to_numpy()[rows]
+    candidates = data[match_columns].to_numpy()
+    hits = [(candidates[found] == answer).any() for found, answer in zip(top, answers)]
+    return float(np.mean(hits))
+
+
+def name_only_share(neighbors, data):
+    cast = people(data)
+    genres = [set(value.split()) for value in data["genres"]]
+    unrelated = sum(
+        not (cast[row] & cast[other] or genres[row] & genres[other])
+        for row in range(len(data)) for other in neighbors[row].tolist()
+    )
+    return unrelated / neighbors.size
+
+
+def recurring(values, counts):
+    return np.flatnonzero((values != MISSING_VALUE) & (values.map(counts).fillna(0) >= 2).to_numpy())
+
+
+def evaluate(model, catalog, data, director_rows, actor_rows):
+    start = time.perf_counter()
+    features, vocabulary = model.fit(catalog)
+    fit_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    neighbors, _ = build_neighbor_table(features, K)
+    table_seconds = time.perf_counter() - start
+    director = held_out_recall(model, features, vocabulary, data, director_rows, "director_name", ["director_name"])
+    actor = held_out_recall(model, features, vocabulary, data, actor_rows, "actor_1_name", ACTOR_COLUMNS)
+    print(f"{model.name:<36}{features.shape[1]:>8}{features.nnz:>9}{fit_seconds:>8.2f}{table_seconds:>9.2f}"
+          f"{director:>10.3f}{actor:>9.3f}{name_only_share(neighbors, data):>11.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--csv", default="main_data.csv")
+    parser.add_argument("--weights", nargs="*", default=["genre=0.5", "genre=2", "director=2"],
+                        metavar="FIELD=WEIGHT", help="Extra TF-IDF runs, each overriding one field weight")
+    args = parser.parse_args()
+
+    catalog = read_catalog(args.csv)
+    data = pd.DataFrame({column: catalog.column(column).astype(object) for column in FEATURE_COLUMNS})
+    director_rows = recurring(data["director_name"], data["director_name"].value_counts())
+    actor_counts = pd.concat([data[column] for column in ACTOR_COLUMNS]).value_counts()
+    actor_rows = recurring(data["actor_1_name"], actor_counts)
+    print(f"{len(data)} movies; {len(director_rows)} director and {len(actor_rows)} lead actor queries")
+
+    models = [CombModel()] + [FieldModel(weighting) for weighting in WEIGHTINGS]
+    for override in args.weights:
+        field, _, weight = override.partition("=")
+        models.append(FieldModel("tfidf", {field: float(weight)}))
+
+    print(f"{'model':<36}{'terms':>8}{'nnz':>9}{'fit s':>8}{'table s':>9}"
+          f"{'director':>10}{'actor':>9}{'name only':>11}")
+    for model in models:
+        evaluate(model, catalog, data, director_rows, actor_rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Size and top-10 agreement of the neighbor table with its scores stored as float32, float16 or uint8
+
+Run from the repository root: python benchmarks/eval_quantized.py --csv main_data.csv
+
+The model is built once, then saved and loaded with each score dtype.
+'served' is the share of catalog titles whose top-10 from the loaded
+model equals the float32 model's, over every title. 'new ties' is the
+share of lists whose top-10 gain a tie the exact scores do not have, so
+ranking by the stored scores alone would be ambiguous; nothing does, as
+the exact order is stored positionally. 'append' builds the model
+without the last --append rows, adds them incrementally and compares
+every neighbor list with the float32 model updated the same way. Sizes
+are those of the saved table; 'vs float64' compares the scores with a
+float64 table, as cosine_similarity would produce.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from movie_recommender.model_store import build_engine, load_engine, save_engine, update_model  # noqa: E402
+from movie_recommender.quantized_scores import SCORE_DTYPES  # noqa: E402
+
+K = 10
+APPEND_ROWS = 100
+
+
+def new_ties(scores, exact):
+    scores, exact = scores[:, :K], exact[:, :K]
+    return ((scores[:, 1:] == scores[:, :-1]) & (exact[:, 1:] != exact[:, :-1])).any(axis=1).mean()
+
+
+def table_bytes(version_dir):
+    names = ["neighbors.npy", "neighbor_scores.npy", "neighbor_score_scale.npy"]
+    sizes = {name: os.path.getsize(os.path.join(version_dir, name))
+             for name in names if os.path.exists(os.path.join(version_dir, name))}
+    return sizes["neighbors.npy"], sum(sizes.values()) - sizes["neighbors.npy"]
+
+
+def appended_table(csv_path, workdir, n_append, score_dtype):
+    data = pd.read_csv(csv_path)
+    head_csv = os.path.join(workdir, f"head_{score_dtype}.csv")
+    model_dir = os.path.join(workdir, f"append_{score_dtype}")
+    data.iloc[:-n_append].to_csv(head_csv, index=False)
+    build_engine(head_csv, model_dir, score_dtype=score_dtype)
+    data.to_csv(head_csv, index=False)
+    return np.asarray(update_model(head_csv, model_dir, append=data.iloc[-n_append:]).neighbors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--csv", default="main_data.csv")
+    parser.add_argument("--append", type=int, default=APPEND_ROWS, help="Rows appended incrementally (0 to skip)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        exact = build_engine(args.csv, os.path.join(workdir, "float32"))
+        n_rows, n_neighbors = exact.neighbors.shape
+        titles = [exact.titles[row] for row in range(n_rows)]
+        expected = exact.recommend(titles, K)
+        float64_bytes = exact.neighbor_scores.size * 8
+        exact_appended = appended_table(args.csv, workdir, args.append, "float32") if args.append else None
+        print(f"{n_rows} movies x {n_neighbors} neighbors; top-{K} agreement over every title")
+
+        print(f"{'scores':<9}{'scores MB':>10}{'vs float64':>11}{'table MB':>10}{'max error':>11}{'served':>8}"
+              f"{'new ties':>10}{'append':>8}")
+        for score_dtype in SCORE_DTYPES:
+            model_dir = os.path.join(workdir, f"saved_{score_dtype}")
+            manifest = save_engine(exact, "0" * 64, model_dir, score_dtype)
+            engine = load_engine(model_dir)
+            index_bytes, score_bytes = table_bytes(os.path.join(model_dir, manifest["version"]))
+
+            scores = np.asarray(engine.neighbor_scores)
+            error = float(np.abs(scores - exact.neighbor_scores)[np.isfinite(exact.neighbor_scores)].max())
+            served = np.mean([a == b for a, b in zip(engine.recommend(titles, K), expected)])
+            ties = new_ties(scores, exact.neighbor_scores)
+            appended = "-"
+            if args.append:
+                same = appended_table(args.csv, workdir, args.append, score_dtype) == exact_appended
+                appended = f"{same.all(axis=1).mean():.4f}"
+            print(f"{score_dtype:<9}{score_bytes / 2 ** 20:>10.2f}{float64_bytes / score_bytes:>10.1f}x"
+                  f"{(index_bytes + score_bytes) / 2 ** 20:>10.2f}{error:>11.2e}{served:>8.4f}{ties:>10.4f}"
+                  f"{appended:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""Local stand-ins for the TMDb API and IMDb review pages, replaying recorded responses with added latency
+
+Run from the repository root to serve them for a manual test:
+    python benchmarks/stub_servers.py --latency-ms 80
+and to record real responses for a few titles:
+    python benchmarks/stub_servers.py --record recordings.json --api-key KEY --titles avatar alien
+
+Recordings are JSON, {"tmdb": {request key: body}, "imdb": {request key:
+html}}, where the request key is the path and sorted query without the
+API key (see request_key). Requests that were not recorded get a
+synthetic response, so every title searched for is found, with five cast
+members and a page of reviews.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_pipeline import review_page  # noqa: E402
+from movie_recommender.reviews import USER_AGENT  # noqa: E402
+from movie_recommender.title_index import normalize_title  # noqa: E402
+
+REVIEW_TEXTS = [
+    "A gripping story with wonderful performances and a score that stays with you long after the credits.",
+    "Beautifully shot, but the plot drags and the dialogue is dull. I was bored for most of the second half.",
+    "One of the best films of the year: smart, funny and moving, with a cast that clearly loved the material.",
+    "The effects are impressive, yet the characters are thin and the ending feels rushed and predictable.",
+    "An absolute delight from start to finish. I would happily watch it again with friends.",
+]
+CAST_SIZE = 5
+REVIEWS_PER_PAGE = 10
+
+
+def request_key(path, query=""):
+    """path?query with the parameters sorted and api_key left out"""
+    params = sorted((name, value) for name, value in parse_qsl(query) if name != "api_key")
+    return f"{path}?{urlencode(params)}" if params else path
+
+
+def endpoint(path):
+    """path with every segment holding a digit replaced by {id}, e.g. /movie/{id}/credits"""
+    return "/".join("{id}" if any(char.isdigit() for char in part) else part for part in path.rstrip("/").split("/"))
+
+
+def movie_id(title):
+    return zlib.crc32(normalize_title(title).encode("utf-8")) % 10_000_000 + 1
+
+
+class StubServer:
+    """Threaded HTTP server on a free local port answering one service's requests with latency
+
+    respond(path, params) returns (status, content type, body) for requests
+    that were not recorded. Latency is latency_ms plus up to jitter_ms,
+    slept before every response. counts holds the requests served per
+    endpoint (see endpoint).
+    """
+
+    def __init__(self, respond, recorded=None, latency_ms=0, jitter_ms=0, content_type="application/json"):
+        self.respond = respond
+        self.recorded = recorded or {}
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.content_type = content_type
+        self.counts = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stub.handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def handle(self, request):
+        parts = urlsplit(request.path)
+        with self._lock:
+            self.counts[endpoint(parts.path)] = self.counts.get(endpoint(parts.path), 0) + 1
+        time.sleep((self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000)
+
+        body = self.recorded.get(request_key(parts.path, parts.query))
+        if body is not None:
+            status, content_type = 200, self.content_type
+            body = body if isinstance(body, str) else json.dumps(body)
+        else:
+            status, content_type, body = self.respond(parts.path, dict(parse_qsl(parts.query)))
+        data = body.encode("utf-8")
+        request.send_response(status)
+        request.send_header("Content-Type", content_type)
+        request.send_header("Content-Length", str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
+
+    def reset_counts(self):
+        with self._lock:
+            counts, self.counts = self.counts, {}
+        return counts
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class SyntheticTMDb:
+    """Search, details and credits responses made up from the searched title"""
+
+    def __init__(self):
+        self.titles = {}
+
+    def __call__(self, path, params):
+        parts = path.strip("/").split("/")
+        if parts == ["search", "movie"]:
+            query = params.get("query", "")
+            self.titles[movie_id(query)] = query
+            result = {"id": movie_id(query), "title": query, "poster_path": f"/poster{movie_id(query)}.jpg"}
+            return 200, "application/json", json.dumps({"results": [result]})
+        if parts == ["configuration"]:
+            return 200, "application/json", json.dumps({"images": {"base_url": "http://image.tmdb.org/t/p/"}})
+        if len(parts) in (2, 3) and parts[0] == "movie" and parts[1].isdigit():
+            number = int(parts[1])
+            if len(parts) == 3:
+                cast = [
+                    {"name": f"Actor {number}-{i}", "character": f"Role {i}", "profile_path": f"/cast{number}-{i}.jpg"}
+                    for i in range(CAST_SIZE)
+                ]
+                return 200, "application/json", json.dumps({"id": number, "cast": cast})
+            details = {
+                "id": number,
+                "title": self.titles.get(number, f"Movie {number}"),
+                "imdb_id": f"tt{number:07d}",
+                "overview": "A synthetic overview served by the TMDb stub.",
+                "release_date": "2009-12-10",
+                "runtime": 120 + number % 60,
+                "vote_average": 5 + number % 50 / 10,
+                "vote_count": number % 10000,
+                "genres": [{"id": 28, "name": "Action"}, {"id": 12, "name": "Adventure"}],
+                "poster_path": f"/poster{number}.jpg",
+            }
+            return 200, "application/json", json.dumps(details)
+        return 404, "application/json", json.dumps({"status_message": "not found"})
+
+
+def synthetic_imdb(path, params):
+    parts = path.strip("/").split("/")
+    if len(parts) >= 3 and parts[0] == "title" and parts[2] == "reviews":
+        start = zlib.crc32(parts[1].encode("utf-8"))
+        texts = [REVIEW_TEXTS[(start + i) % len(REVIEW_TEXTS)] for i in range(REVIEWS_PER_PAGE)]
+        return 200, "text/html", review_page(texts).decode("utf-8")
+    return 404, "text/html", "<html></html>"
+
+
+def start_stubs(recordings=None, latency_ms=0, jitter_ms=0, imdb_latency_ms=None):
+    """Started (tmdb, imdb) stub servers; imdb_latency_ms defaults to latency_ms"""
+    recordings = recordings or {}
+    tmdb = StubServer(SyntheticTMDb(), recordings.get("tmdb"), latency_ms, jitter_ms)
+    imdb = StubServer(synthetic_imdb, recordings.get("imdb"),
+                      latency_ms if imdb_latency_ms is None else imdb_latency_ms, jitter_ms, "text/html")
+    return tmdb.start(), imdb.start()
+
+
+def stub_environment(tmdb, imdb):
+    """Environment variables pointing movie_recommender's TMDb client and review fetcher at the stubs"""
+    return {
+        "TMDB_API_URL": tmdb.url,
+        "IMDB_REVIEWS_URL": f"{imdb.url}/title/{{imdb_id}}/reviews/",
+    }
+
+
+def load_recordings(path):
+    if not path:
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def record(path, titles, api_key):
+    """Fetch search, details, credits and the IMDb reviews page of each title into a recordings file"""
+    import requests
+
+    from movie_recommender.tmdb_client import TMDB_API_URL
+
+    session = requests.Session()
+    recordings = load_recordings(path) if os.path.exists(path) else {}
+    tmdb, imdb = recordings.setdefault("tmdb", {}), recordings.setdefault("imdb", {})
+
+    def get(path, **params):
+        response = session.get(f"{TMDB_API_URL}{path}", params={"api_key": api_key, **params}, timeout=10)
+        response.raise_for_status()
+        tmdb[request_key(path, urlencode(params))] = response.json()
+        return response.json()
+
+    for title in titles:
+        results = get("/search/movie", query=title).get("results")
+        if not results:
+            print(f"❌ No TMDb result for {title!r}")
+            continue
+        details = get(f"/movie/{results[0]['id']}")
+        get(f"/movie/{results[0]['id']}/credits")
+        if details.get("imdb_id"):
+            reviews_path = f"/title/{details['imdb_id']}/reviews/"
+            response = session.get(f"https://www.imdb.com{reviews_path}", headers={"User-Agent": USER_AGENT},
+                                   timeout=10)
+            if response.status_code == 200:
+                imdb[request_key(reviews_path)] = response.text
+        print(f"✅ Recorded {title}")
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(recordings, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recordings", help="Recorded responses to replay")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Added to every response")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Random extra latency, up to this much")
+    parser.add_argument("--record", metavar="JSON", help="Record real responses to this file instead of serving")
+    parser.add_argument("--api-key", default=os.environ.get("TMDB_API_KEY"), help="TMDb API key for --record")
+    parser.add_argument("--titles", nargs="+", default=[], help="Titles to record")
+    args = parser.parse_args()
+
+    if args.record:
+        if not args.api_key:
+            parser.error("--record needs a TMDb API key (--api-key or TMDB_API_KEY)")
+        record(args.record, args.titles, args.api_key)
+        return
+
+    tmdb, imdb = start_stubs(load_recordings(args.recordings), args.latency_ms, args.jitter_ms)
+    print("Stubs are running; start the app with:")
+    # A separate TMDb cache, so stub responses never reach the real one
+    environment = dict(stub_environment(tmdb, imdb),
+                       TMDB_CACHE_PATH=os.path.join(tempfile.gettempdir(), "stub_tmdb_cache.sqlite"))
+    print(" ".join(f"{name}='{value}'" for name, value in environment.items()), "streamlit run streamlit_app.py")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        tmdb.stop()
+        imdb.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Synthetic catalogs shaped like main_data.csv, for benchmarks beyond 6k titles
+
+People are recombined from the first and last names in the real catalog and
+drawn with a Zipf-like popularity, so prolific directors and actors recur
+across many movies the way they do in main_data.csv.
+"""
+import numpy as np
+import pandas as pd
+
+PEOPLE_PER_MOVIE = 1.5
+CHUNK_ROWS = 100000
+PEOPLE_COLUMNS = ["director_name", "actor_1_name", "actor_2_name", "actor_3_name"]
+
+
+def _people(data, n_people, rng):
+    names = pd.concat([data[column] for column in PEOPLE_COLUMNS]).dropna()
+    parts = names.str.split(n=1, expand=True).dropna()
+    first = parts[0].unique()
+    last = parts[1].unique()
+    people = {f"{a} {b}" for a, b in zip(rng.choice(first, n_people), rng.choice(last, n_people))}
+    people = np.array(sorted(people), dtype=object)
+    rng.shuffle(people)
+    return people
+
+
+def iter_catalog(n_rows, source="main_data.csv", seed=0, chunk_rows=CHUNK_ROWS):
+    """Yield a synthetic catalog of n_rows movies as DataFrames of at most chunk_rows"""
+    rng = np.random.default_rng(seed)
+    data = pd.read_csv(source)
+    people = _people(data, max(int(n_rows * PEOPLE_PER_MOVIE), 100), rng)
+    weights = 1.0 / np.arange(1, len(people) + 1) ** 1.1
+    weights /= weights.sum()
+    genres = data["genres"].dropna().to_numpy()
+
+    for start in range(0, n_rows, chunk_rows):
+        size = min(chunk_rows, n_rows - start)
+        chunk = pd.DataFrame({name: people[rng.choice(len(people), size, p=weights)] for name in PEOPLE_COLUMNS})
+        chunk["genres"] = rng.choice(genres, size)
+        chunk["movie_title"] = [f"synthetic movie {i}" for i in range(start, start + size)]
+        chunk["comb"] = (chunk["actor_1_name"] + " " + chunk["actor_2_name"] + " " + chunk["actor_3_name"]
+                         + " " + chunk["director_name"] + " " + chunk["genres"])
+        yield chunk
+
+
+def make_catalog(n_rows, source="main_data.csv", seed=0):
+    """DataFrame with main_data.csv's columns and n_rows synthetic movies"""
+    return pd.concat(iter_catalog(n_rows, source, seed), ignore_index=True)
+
+
+def write_catalog(path, n_rows, source="main_data.csv", seed=0):
+    """Write a synthetic catalog CSV chunk by chunk, so large catalogs never sit in memory whole"""
+    for position, chunk in enumerate(iter_catalog(n_rows, source, seed)):
+        chunk.to_csv(path, mode="a" if position else "w", header=not position, index=False)
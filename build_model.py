@@ -0,0 +1,147 @@
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+from movie_recommender.field_features import FIELDS, WEIGHTINGS
+from movie_recommender.model_store import MODEL_DIR, build_engine, is_up_to_date, update_model
+from movie_recommender.neighbor_index import INDEX_TYPES, N_PROBE
+from movie_recommender.quantized_scores import SCORE_DTYPES
+from movie_recommender.similarity_engine import DEFAULT_NEIGHBORS, MEMORY_BUDGET, combine_features
+from movie_recommender.title_index import normalize_title
+
+
+def append_to_csv(csv_path, new_path):
+    """Append the movies in new_path to the catalog CSV, deriving comb if it is missing"""
+    columns = pd.read_csv(csv_path, nrows=0).columns
+    new = pd.read_csv(new_path)
+    if "comb" not in new:
+        new["comb"] = combine_features(new)
+    missing = set(columns) - set(new.columns)
+    if missing:
+        raise ValueError(f"{new_path} lacks columns: {', '.join(sorted(missing))}")
+    new[columns].to_csv(csv_path, mode="a", header=False, index=False)
+    return new
+
+
+def delete_from_csv(csv_path, titles):
+    """Remove every movie titled one of titles from the catalog CSV; returns how many rows went"""
+    data = pd.read_csv(csv_path)
+    drop = data["movie_title"].map(normalize_title).isin({normalize_title(title) for title in titles})
+    if not drop.any():
+        return 0
+    tmp_path = f"{csv_path}.tmp"
+    data[~drop].to_csv(tmp_path, index=False)
+    os.replace(tmp_path, csv_path)
+    return int(drop.sum())
+
+
+def parse_weights(pairs):
+    """{field: weight} from FIELD=WEIGHT strings"""
+    weights = {}
+    for pair in pairs or ():
+        field, sep, weight = pair.partition("=")
+        if not sep:
+            raise ValueError(f"Expected FIELD=WEIGHT, got {pair!r}")
+        weights[field] = float(weight)
+    return weights
+
+
+def feature_params(args):
+    if args.features != "fields":
+        return None
+    return {"weights": parse_weights(args.weight), "weighting": args.weighting}
+
+
+def table_params(args):
+    """Keyword arguments for build_engine's neighbor table, reporting progress on one redrawn line"""
+    start = time.perf_counter()
+
+    def progress(done, total):
+        print(f"\r⏳ Neighbors: {done}/{total} movies ({done / total:.0%}, {time.perf_counter() - start:.1f}s)",
+              end="\n" if done == total else "", flush=True)
+
+    return {"workers": args.workers, "memory_budget": args.memory_mb << 20, "progress": progress,
+            "score_dtype": args.score_dtype}
+
+
+def update(args):
+    # Only a model that matched the catalog before the edit can be updated in place of a rebuild
+    incremental = is_up_to_date(args.csv, args.out)
+    new, deleted = None, 0
+    if args.delete:
+        deleted = delete_from_csv(args.csv, args.delete)
+    if args.append:
+        new = append_to_csv(args.csv, args.append)
+    added = 0 if new is None else len(new)
+    print(f"📦 Catalog {args.csv}: {added} added, {deleted} deleted")
+
+    start = time.perf_counter()
+    if incremental:
+        engine = update_model(args.csv, args.out, new, args.delete)
+        print(f"✅ Updated {args.out} to {len(engine)} movies in {time.perf_counter() - start:.2f}s")
+    else:
+        print(f"🔨 Model in {args.out} was not built from {args.csv}; rebuilding...")
+        build_engine(args.csv, args.out, args.neighbors, args.index, features=args.features,
+                     feature_params=feature_params(args), **table_params(args))
+        print(f"✅ Rebuilt {args.out} in {time.perf_counter() - start:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the persisted recommendation model")
+    parser.add_argument("--csv", default="main_data.csv", help="Catalog CSV to build from")
+    parser.add_argument("--out", default=MODEL_DIR, help="Directory to write the model to")
+    parser.add_argument("--neighbors", type=int, default=DEFAULT_NEIGHBORS,
+                        help="Neighbors to precompute per movie (0 to skip the table)")
+    parser.add_argument("--index", choices=sorted(INDEX_TYPES), default="exact",
+                        help="Neighbor index for queries outside the table; 'ivf' is approximate, for large catalogs")
+    parser.add_argument("--lists", type=int, help="IVF clusters (default: square root of the movie count)")
+    parser.add_argument("--probes", type=int, default=N_PROBE, help="IVF clusters searched per query")
+    parser.add_argument("--features", choices=["fields", "comb"], default="fields",
+                        help="Whole-name weighted fields, or the bag of words over the comb column")
+    parser.add_argument("--weighting", choices=WEIGHTINGS, default="tfidf", help="Term weighting within each field")
+    parser.add_argument("--weight", nargs="+", metavar="FIELD=WEIGHT",
+                        help=f"Field weights, e.g. genre=0.5 (fields: {', '.join(FIELDS)}; default 1)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Processes computing the neighbor table (default: one per CPU)")
+    parser.add_argument("--memory-mb", type=int, default=MEMORY_BUDGET >> 20,
+                        help="Memory budget for the neighbor table blocks, shared by the workers")
+    parser.add_argument("--score-dtype", choices=SCORE_DTYPES, default="float32",
+                        help="Storage of neighbor scores; float16 and uint8 (per-row scale) are smaller, "
+                             "and the neighbor order stays exact")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the CSV is unchanged")
+    parser.add_argument("--append", metavar="CSV", help="Add the movies in this CSV to the catalog and model")
+    parser.add_argument("--delete", nargs="+", metavar="TITLE", help="Remove these titles from the catalog and model")
+    args = parser.parse_args()
+
+    if args.append or args.delete:
+        try:
+            update(args)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        return
+
+    if not args.force and is_up_to_date(args.csv, args.out):
+        print(f"✅ Model in {args.out} is up to date with {args.csv}")
+        return
+
+    print(f"🔨 Building model from {args.csv}...")
+    start = time.perf_counter()
+    index_params = {"n_lists": args.lists, "n_probe": args.probes} if args.index == "ivf" else {}
+    try:
+        engine = build_engine(args.csv, args.out, args.neighbors, args.index, index_params, args.features,
+                              feature_params(args), **table_params(args))
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+    rows, terms = engine.features.shape
+    print(f"✅ Wrote {rows} movies x {terms} terms ({args.features} features, {args.index} index) to {args.out} "
+          f"in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
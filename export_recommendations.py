@@ -0,0 +1,265 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from movie_recommender.model_store import MODEL_DIR, load_engine, load_or_build_engine, model_version
+from movie_recommender.similarity_engine import MEMORY_BUDGET, neighbor_block_size
+
+EXPORT_DIR = "recommendations"
+STATE = "export.json"
+FORMATS = ["csv", "parquet", "jsonl"]
+COLUMNS = ["title", "rank", "recommendation", "score"]
+# State keys a resumed export takes from the directory rather than the arguments
+CHUNKING = ("chunk_size", "chunks")
+
+
+def catalog_titles(engine):
+    """Every title in the catalog once, as the row a lookup of it resolves to"""
+    return [
+        (title, row) for row, title in enumerate(engine.titles.titles)
+        if row not in engine.deleted and engine.titles.lookup(title) == row
+    ]
+
+
+def listed_titles(engine, path):
+    """(title, row) for each line of path, row None where the title is not in the catalog"""
+    with open(path, encoding="utf-8") as f:
+        titles = [line.strip() for line in f if line.strip()]
+    return [(title, engine.titles.lookup(title)) for title in titles]
+
+
+def titles_sha256(titles):
+    digest = hashlib.sha256()
+    for title, _ in titles:
+        digest.update(title.encode("utf-8") + b"\n")
+    return digest.hexdigest()
+
+
+def part_path(directory, chunk, output_format):
+    return os.path.join(directory, f"part-{chunk:05d}.{output_format}")
+
+
+def score_chunk(engine, titles, k):
+    """Rows for a chunk of (title, row): COLUMNS rows for every found title, and the missing titles"""
+    found = [(title, row) for title, row in titles if row is not None]
+    missing = [title for title, row in titles if row is None]
+    if not found:
+        return [], missing
+    rows = np.array([row for _, row in found], dtype=np.intp)
+    top = engine.similar_batch(rows, k)
+    # Exact cosine of each query with its recommendations, one sparse row product per pair
+    pairs = engine.features[np.repeat(rows, top.shape[1])].multiply(engine.features[top.ravel()])
+    scores = np.asarray(pairs.sum(axis=1)).reshape(top.shape)
+    records = [
+        (title, rank + 1, engine.titles[neighbor], round(float(score), 6))
+        for (title, _), neighbors, row_scores in zip(found, top.tolist(), scores)
+        for rank, (neighbor, score) in enumerate(zip(neighbors, row_scores))
+    ]
+    return records, missing
+
+
+def write_chunk(path, records, missing, output_format):
+    """Write one chunk's part file atomically, so a part that exists is always complete"""
+    directory, name = os.path.split(path)
+    tmp_path = os.path.join(directory, f".{name}")
+    if output_format == "jsonl":
+        lists = {}
+        for title, _, recommendation, score in records:
+            lists.setdefault(title, []).append({"title": recommendation, "score": score})
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for title, recommendations in lists.items():
+                f.write(json.dumps({"title": title, "recommendations": recommendations}, ensure_ascii=False) + "\n")
+            for title in missing:
+                f.write(json.dumps({"title": title, "error": "not found"}, ensure_ascii=False) + "\n")
+    else:
+        frame = pd.DataFrame(records, columns=COLUMNS).astype({"rank": "int32", "score": "float32"})
+        if output_format == "csv":
+            frame.to_csv(tmp_path, index=False)
+        else:
+            frame.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+# Set in each pool worker by _init_worker, so every worker maps the model
+# once rather than receiving it with each chunk
+_engine = None
+
+
+def _init_worker(model_dir, version):
+    global _engine
+    _engine = load_engine(model_dir)
+    if model_version(_engine.manifest) != version:
+        raise RuntimeError(f"The model in {model_dir} changed during the export; run again")
+
+
+def export_chunk(chunk, titles, k, directory, output_format):
+    records, missing = score_chunk(_engine, titles, k)
+    write_chunk(part_path(directory, chunk, output_format), records, missing, output_format)
+    return len(missing)
+
+
+def prepare(directory, settings, chunk_size, force, explicit=False):
+    """Create directory for an export with settings, returning its state and the chunks already written
+
+    An unfinished export with the same settings resumes with the chunk size
+    it started with, so a rerun with other --workers or --memory-mb (or on
+    another host) picks up its parts; chunk_size only sizes a new export.
+    A directory left by an export with other settings (or another model
+    version, or an explicit --chunk-size it was not written with) is only
+    reused with force, which deletes its parts. explicit marks a chunk_size
+    the user asked for rather than one derived from the machine.
+    """
+    os.makedirs(directory, exist_ok=True)
+    state_path = os.path.join(directory, STATE)
+    state = None
+    if os.path.exists(state_path):
+        with open(state_path, encoding="utf-8") as f:
+            state = json.load(f)
+    if state is not None and ({key: value for key, value in state.items() if key not in CHUNKING} != settings
+                              or explicit and state["chunk_size"] != chunk_size):
+        if not force:
+            raise ValueError(f"{directory} holds an export with other settings or another model; "
+                             "pass --force to start over")
+        state = None
+    if state is None:
+        for path in glob.glob(os.path.join(directory, "part-*")) + glob.glob(os.path.join(directory, ".part-*")):
+            os.remove(path)
+        state = dict(settings, chunk_size=chunk_size, chunks=-(-settings["titles"] // chunk_size))
+        tmp_path = f"{state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=1)
+        os.replace(tmp_path, state_path)
+    return state, {chunk for chunk in range(state["chunks"])
+                   if os.path.exists(part_path(directory, chunk, state["format"]))}
+
+
+def export(engine, titles, directory, settings, pending, workers, model_dir):
+    """Write a part file for every pending chunk, with up to two chunks per worker in flight"""
+    chunk_size, k, output_format = settings["chunk_size"], settings["k"], settings["format"]
+    jobs = ((chunk, titles[chunk * chunk_size:(chunk + 1) * chunk_size]) for chunk in pending)
+    written, missing = 0, 0
+
+    def report(chunk_missing):
+        nonlocal written, missing
+        written += 1
+        missing += chunk_missing
+        print(f"📦 {settings['chunks'] - len(pending) + written}/{settings['chunks']} chunks written")
+
+    if workers <= 1:
+        global _engine
+        _engine = engine
+        for chunk, chunk_titles in jobs:
+            report(export_chunk(chunk, chunk_titles, k, directory, output_format))
+        return written, missing
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker,
+                             initargs=(model_dir, settings["model_version"])) as pool:
+        in_flight = set()
+        try:
+            for chunk, chunk_titles in jobs:
+                if len(in_flight) >= 2 * workers:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        report(future.result())
+                in_flight.add(pool.submit(export_chunk, chunk, chunk_titles, k, directory, output_format))
+            for future in in_flight:
+                report(future.result())
+        except BaseException:
+            pool.shutdown(cancel_futures=True)
+            raise
+    return written, missing
+
+
+def merge(directory, settings, path):
+    """Concatenate the part files, in chunk order, into one file at path, a part at a time"""
+    output_format = settings["format"]
+    parts = [part_path(directory, chunk, output_format) for chunk in range(settings["chunks"])]
+    tmp_path = f"{path}.tmp"
+    if output_format == "parquet":
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for part in parts:
+                table = pq.read_table(part)
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp_path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        with open(tmp_path, "wb") as out:
+            for i, part in enumerate(parts):
+                with open(part, "rb") as f:
+                    if output_format == "csv" and i:
+                        f.readline()
+                    shutil.copyfileobj(f, out)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the top-k recommendations of every catalog title")
+    parser.add_argument("--csv", default="main_data.csv", help="Catalog CSV the model is built from")
+    parser.add_argument("--model", default=MODEL_DIR, help="Model directory")
+    parser.add_argument("--titles", metavar="FILE", help="Export these titles, one per line, instead of the catalog")
+    parser.add_argument("--k", type=int, default=10, help="Recommendations per title")
+    parser.add_argument("--format", choices=FORMATS, default="csv", help="Format of the part files")
+    parser.add_argument("--out", default=EXPORT_DIR, help="Directory for the part files")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Processes scoring chunks (default: one per CPU)")
+    parser.add_argument("--memory-mb", type=int, default=MEMORY_BUDGET >> 20,
+                        help="Memory budget for scoring, shared by the workers; sizes the chunks")
+    parser.add_argument("--chunk-size", type=int, help="Titles per chunk and part file (default: from --memory-mb)")
+    parser.add_argument("--force", action="store_true", help="Start over if --out holds a different export")
+    parser.add_argument("--merge", metavar="FILE", help="Also concatenate the part files into this file when done")
+    args = parser.parse_args()
+
+    engine = load_or_build_engine(args.csv, args.model)
+    titles = listed_titles(engine, args.titles) if args.titles else catalog_titles(engine)
+    chunk_size = args.chunk_size or neighbor_block_size(len(engine), args.memory_mb << 20, args.workers)
+    settings = {
+        "model_version": model_version(engine.manifest),
+        "k": args.k,
+        "format": args.format,
+        "titles": len(titles),
+        "titles_sha256": titles_sha256(titles),
+    }
+    try:
+        settings, written = prepare(args.out, settings, chunk_size, args.force, explicit=args.chunk_size is not None)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    chunk_size = settings["chunk_size"]
+    pending = [chunk for chunk in range(settings["chunks"]) if chunk not in written]
+    print(f"🎬 {len(titles)} titles in {settings['chunks']} chunks of {chunk_size}; "
+          f"{len(pending)} chunks to write into {args.out}")
+
+    start = time.perf_counter()
+    try:
+        _, missing = export(engine, titles, args.out, settings, pending, min(args.workers, len(pending)), args.model)
+    except KeyboardInterrupt:
+        print("\n⏸️ Interrupted; run again to resume")
+        sys.exit(130)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"✅ Exported {len(pending)} chunks in {time.perf_counter() - start:.1f}s"
+          + (f" ({missing} not in the catalog)" if missing else ""))
+
+    if args.merge:
+        merge(args.out, settings, args.merge)
+        print(f"🗜️ Merged {settings['chunks']} parts into {args.merge}")
+
+
+if __name__ == "__main__":
+    main()
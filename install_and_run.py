@@ -13,9 +13,10 @@ def check_and_install_requirements():
         "numpy>=1.21.0", 
         "pandas>=1.3.0",
         "scikit-learn>=1.0.0",
-        "beautifulsoup4>=4.10.0",
         "requests>=2.25.0",
-        "lxml>=4.6.0"
+        "lxml>=4.6.0",
+        "pyarrow>=10.0.0",
+        "uvicorn>=0.20.0"
     ]
     
     for package in required_packages:
@@ -0,0 +1,51 @@
+"""Movie recommendation core: similarity engine, model store, sentiment scoring and TMDb client
+
+Nothing here imports Streamlit. Importing the package is cheap: names are
+loaded from their submodules on first use, and sklearn and pandas are only
+imported by the code that fits models or reads CSVs, so loading and
+querying a saved model needs neither.
+
+    from movie_recommender import load_or_build_engine
+
+    engine = load_or_build_engine("main_data.csv")
+    engine.recommend(["avatar"], k=10)
+"""
+import importlib
+
+_EXPORTS = {
+    "SimilarityEngine": "similarity_engine",
+    "TitleIndex": "title_index",
+    "MODEL_DIR": "model_store",
+    "build_engine": "model_store",
+    "load_engine": "model_store",
+    "load_or_build_engine": "model_store",
+    "model_version": "model_store",
+    "ResultCache": "result_cache",
+    "read_catalog": "catalog",
+    "FieldVectorizer": "field_features",
+    "RecommendationService": "service",
+    "SentimentScorer": "sentiment",
+    "keyword_sentiments": "sentiment",
+    "load_sentiment_models": "sentiment",
+    "TMDbCache": "tmdb_cache",
+    "TMDbClient": "tmdb_client",
+    "TMDbError": "tmdb_client",
+    "validate_api_key": "tmdb_client",
+    "MetadataStore": "metadata_store",
+    "ReviewPipeline": "reviews",
+    "TRACER": "tracing",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
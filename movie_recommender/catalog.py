@@ -0,0 +1,87 @@
+import numpy as np
+from scipy import sparse
+
+from .similarity_engine import FEATURE_COLUMNS
+
+CHUNK_ROWS = 100000
+MISSING_VALUE = "unknown"
+
+
+class Catalog:
+    """Movie catalog with every people and genre value interned to an integer code
+
+    codes holds one column per entry of FEATURE_COLUMNS; values[code] is the
+    string. A name that appears as both director and actor shares one code,
+    and each distinct string is stored once however many movies use it.
+    """
+
+    def __init__(self, values, codes, titles):
+        self.values = values
+        self.codes = codes
+        self.titles = titles
+
+    def __len__(self):
+        return len(self.titles)
+
+    def column(self, name):
+        """A feature column as a pandas Categorical over the interned values"""
+        import pandas as pd
+
+        codes = self.codes[:, FEATURE_COLUMNS.index(name)]
+        return pd.Categorical.from_codes(codes, categories=pd.Index(self.values, dtype=object))
+
+    def feature_matrix(self):
+        """The L2-normalized count matrix and vocabulary CountVectorizer fits on the comb column
+
+        Each distinct value is tokenized once, and rows are assembled from
+        their codes, so comb is never built. Tokens cannot span the spaces
+        that join comb's fields, which makes the counts identical.
+        """
+        from sklearn.feature_extraction.text import CountVectorizer
+        from sklearn.preprocessing import normalize
+
+        analyzer = CountVectorizer().build_analyzer()
+        value_terms = [analyzer(value) for value in self.values]
+        terms = sorted({term for tokens in value_terms for term in tokens})
+        vocabulary = {term: column for column, term in enumerate(terms)}
+
+        lengths = [len(tokens) for tokens in value_terms]
+        value_matrix = sparse.csr_matrix(
+            (np.ones(sum(lengths)), [vocabulary[term] for tokens in value_terms for term in tokens],
+             np.concatenate([[0], np.cumsum(lengths)])),
+            shape=(len(self.values), len(terms)),
+        )
+        n_rows, n_fields = self.codes.shape
+        row_values = sparse.csr_matrix(
+            (np.ones(n_rows * n_fields), self.codes.ravel(), np.arange(0, n_rows * n_fields + 1, n_fields)),
+            shape=(n_rows, len(self.values)),
+        )
+        counts = (row_values @ value_matrix).tocsr()
+        counts.sort_indices()
+        return normalize(counts, norm="l2", copy=False), vocabulary
+
+
+def read_catalog(csv_path, chunksize=CHUNK_ROWS):
+    """Stream the catalog CSV in chunks into a Catalog, skipping the derived comb column"""
+    import pandas as pd
+
+    # Each chunk is factorized on its own; the distinct values of all chunks
+    # are then interned in one pass, so no Python loop runs per value
+    code_chunks = []
+    uniques = [np.array([MISSING_VALUE], dtype=object)]
+    offset = 1
+    titles = []
+    for chunk in pd.read_csv(csv_path, usecols=FEATURE_COLUMNS + ["movie_title"], dtype=str, chunksize=chunksize):
+        codes = np.empty((len(chunk), len(FEATURE_COLUMNS)), dtype=np.int64)
+        for position, name in enumerate(FEATURE_COLUMNS):
+            local_codes, chunk_uniques = pd.factorize(chunk[name])
+            # Missing cells are -1, which maps to the leading 'unknown'
+            codes[:, position] = np.where(local_codes < 0, 0, local_codes + offset)
+            uniques.append(np.asarray(chunk_uniques, dtype=object))
+            offset += len(chunk_uniques)
+        code_chunks.append(codes)
+        titles.extend(chunk["movie_title"].fillna("").tolist())
+
+    global_codes, values = pd.factorize(np.concatenate(uniques))
+    codes = np.concatenate(code_chunks) if code_chunks else np.empty((0, len(FEATURE_COLUMNS)), dtype=np.int64)
+    return Catalog(list(values), global_codes.astype(np.int32)[codes], titles)
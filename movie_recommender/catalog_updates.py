@@ -0,0 +1,198 @@
+import numpy as np
+from scipy import sparse
+
+from .similarity_engine import SimilarityEngine, build_neighbor_table, combine_features, top_k, vectorize
+from .title_index import TitleIndex
+
+# Dense score entries per block when recomputing neighbor lists
+BLOCK_ELEMENTS = 1 << 24
+
+
+class CatalogDelta:
+    """One batch of catalog changes: appended rows and terms, deleted rows and replaced neighbor lists
+
+    Row numbers never shift until the engine is compacted: appended movies
+    take the next rows and deleted ones stay in place, hidden from every
+    lookup.
+    """
+
+    def __init__(self, terms=(), titles=(), features=None, deleted=(), rows=(), neighbors=None,
+                 neighbor_scores=None):
+        self.terms = list(terms)
+        self.titles = list(titles)
+        self.features = features
+        self.deleted = np.asarray(deleted, dtype=np.int32)
+        self.rows = np.asarray(rows, dtype=np.int32)
+        self.neighbors = neighbors
+        self.neighbor_scores = neighbor_scores
+
+
+def _apply_rows(engine, delta):
+    n_terms = len(engine.vocabulary) + len(delta.terms)
+    for term in delta.terms:
+        engine.vocabulary[term] = len(engine.vocabulary)
+
+    features = engine.features
+    if n_terms != features.shape[1]:
+        features = sparse.csr_matrix(
+            (features.data, features.indices, features.indptr), shape=(features.shape[0], n_terms), copy=False
+        )
+    if delta.titles:
+        features = sparse.vstack([features, delta.features], format="csr")
+    engine.features = features
+    engine.titles = TitleIndex(engine.titles.titles + delta.titles, engine.deleted | set(delta.deleted.tolist()))
+    if engine.index is not None and (delta.titles or delta.terms):
+        engine.index.extend(features)
+
+
+def _apply_neighbors(engine, delta):
+    if engine.neighbors is None or not len(delta.rows):
+        return
+    n_new = len(engine) - len(engine.neighbors)
+    # The loaded table may be a read-only map, so changes go to a copy
+    neighbors = np.concatenate([engine.neighbors, np.zeros((n_new, engine.neighbors.shape[1]), np.int32)])
+    scores = np.concatenate([engine.neighbor_scores, np.zeros((n_new, engine.neighbors.shape[1]), np.float32)])
+    neighbors[delta.rows] = delta.neighbors
+    scores[delta.rows] = delta.neighbor_scores
+    engine.neighbors, engine.neighbor_scores = neighbors, scores
+
+
+def _full_lists(engine, rows, k):
+    block_size = max(1, min(len(rows), BLOCK_ELEMENTS // len(engine)))
+    return build_neighbor_table(engine.features, k, block_size, rows, engine.deleted)
+
+
+def _row_dots(features, rows, columns):
+    # Cosine of each (rows[i], columns[i]) pair. The products are added one
+    # term at a time in column order, like the sparse product does, so the
+    # scores and their ties match a rebuild bit for bit
+    products = features[rows].multiply(features[columns]).tocsr()
+    products.sort_indices()
+    lengths = np.diff(products.indptr)
+    padded = np.zeros((len(rows), lengths.max(initial=0)))
+    padded[np.repeat(np.arange(len(rows)), lengths),
+           np.arange(products.nnz) - np.repeat(products.indptr[:-1], lengths)] = products.data
+    dots = np.zeros(len(rows))
+    for term in padded.T:
+        dots += term
+    return dots
+
+
+def _merge_new_rows(engine, new_rows, skip):
+    # An existing row only changes if a new row beats its current k-th
+    # neighbor; its list is then re-ranked over the old list plus those rows.
+    # The k-th score is recomputed from the features rather than read from
+    # the table, whose scores may be stored quantized
+    features = engine.features
+    n_old, k = engine.neighbors.shape
+    new_scores = (features[:n_old] @ features[new_rows].T).tocsr()
+    best = np.zeros(n_old)
+    has_scores = np.flatnonzero(np.diff(new_scores.indptr))
+    best[has_scores] = np.maximum.reduceat(new_scores.data, new_scores.indptr[has_scores])
+    last = np.asarray(engine.neighbors[:, -1], dtype=np.intp)
+    kth = _row_dots(features, np.arange(n_old), last)
+    # Rows with fewer than k candidates end in masked entries: themselves or deleted rows
+    kth[(last == np.arange(n_old)) | np.isin(last, list(engine.deleted))] = -np.inf
+    affected = np.flatnonzero((best > 0) & (best >= kth))
+    affected = affected[~np.isin(affected, list(skip))]
+
+    neighbors = np.empty((len(affected), k), dtype=np.int32)
+    scores = np.empty((len(affected), k), dtype=np.float32)
+    width = k + len(new_rows)
+    block_size = max(1, BLOCK_ELEMENTS // width)
+    for start in range(0, len(affected), block_size):
+        block_rows = affected[start:start + block_size]
+        n_block = len(block_rows)
+        old = np.asarray(engine.neighbors[block_rows])
+        candidates = np.full((n_block, width), len(engine), dtype=np.int64)
+        candidate_scores = np.full((n_block, width), -np.inf)
+        candidates[:, :k] = old
+        candidate_scores[:, :k] = _row_dots(features, np.repeat(block_rows, k), old.ravel()).reshape(n_block, k)
+
+        block = new_scores[block_rows].tocoo()
+        candidates[block.row, k + block.col] = new_rows[block.col]
+        candidate_scores[block.row, k + block.col] = block.data
+        # Order candidates by row so top_k breaks ties towards lower rows
+        order = np.argsort(candidates, axis=1, kind="stable")
+        candidates = np.take_along_axis(candidates, order, axis=1)
+        candidate_scores = np.take_along_axis(candidate_scores, order, axis=1)
+        top = top_k(candidate_scores, k)
+        neighbors[start:start + n_block] = np.take_along_axis(candidates, top, axis=1)
+        scores[start:start + n_block] = np.take_along_axis(candidate_scores, top, axis=1)
+    return affected, neighbors, scores
+
+
+def _neighbor_updates(engine, new_rows=(), stale_rows=()):
+    new_rows = np.asarray(new_rows, dtype=np.intp)
+    k = engine.neighbors.shape[1]
+    full_rows = np.union1d(new_rows, np.asarray(stale_rows, dtype=np.intp))
+    neighbors, scores = _full_lists(engine, full_rows, k)
+    rows = [full_rows]
+    if len(new_rows):
+        skip = set(full_rows.tolist()) | engine.deleted
+        merged_rows, merged, merged_scores = _merge_new_rows(engine, new_rows, skip)
+        rows.append(merged_rows)
+        neighbors = np.concatenate([neighbors, merged])
+        scores = np.concatenate([scores, merged_scores])
+    return np.concatenate(rows), neighbors, scores
+
+
+def append_movies(engine, data):
+    """Add the movies in data to the engine in place and return the changes as a CatalogDelta
+
+    data has the catalog's columns; comb is derived from the people and
+    genres if missing. Only the new rows are vectorized, against the
+    existing vocabulary extended with any unseen terms (and the fitted
+    field statistics, for field features), and only neighbor lists a new
+    movie enters are recomputed.
+    """
+    if engine.vectorizer is not None:
+        features, terms = engine.vectorizer.transform(data, engine.vocabulary)
+    else:
+        comb = data["comb"] if "comb" in data else combine_features(data)
+        features, terms = vectorize(list(comb), engine.vocabulary)
+    delta = CatalogDelta(terms, data["movie_title"], features)
+    n_old = len(engine)
+    _apply_rows(engine, delta)
+
+    if engine.neighbors is not None:
+        delta.rows, delta.neighbors, delta.neighbor_scores = _neighbor_updates(
+            engine, new_rows=np.arange(n_old, len(engine))
+        )
+        _apply_neighbors(engine, delta)
+    return delta
+
+
+def delete_movies(engine, titles):
+    """Hide every row titled one of titles from the engine in place and return the changes as a CatalogDelta
+
+    Neighbor lists that held a deleted movie are recomputed so they stay full.
+    """
+    delta = CatalogDelta(deleted=engine.titles.rows_for(titles))
+    if not len(delta.deleted):
+        return delta
+    _apply_rows(engine, delta)
+
+    if engine.neighbors is not None:
+        stale = np.flatnonzero(np.isin(engine.neighbors, delta.deleted).any(axis=1))
+        stale = stale[~np.isin(stale, list(engine.deleted))]
+        delta.rows, delta.neighbors, delta.neighbor_scores = _neighbor_updates(engine, stale_rows=stale)
+        _apply_neighbors(engine, delta)
+    return delta
+
+
+def compact_engine(engine):
+    """Engine without its deleted rows, renumbered in row order"""
+    keep = np.setdiff1d(np.arange(len(engine)), list(engine.deleted))
+    features = engine.features[keep]
+    titles = TitleIndex([engine.titles[row] for row in keep.tolist()])
+    neighbors = neighbor_scores = index = None
+    if engine.neighbors is not None:
+        renumber = np.full(len(engine), -1, dtype=np.int32)
+        renumber[keep] = np.arange(len(keep), dtype=np.int32)
+        neighbors = renumber[engine.neighbors[keep]]
+        neighbor_scores = np.asarray(engine.neighbor_scores[keep])
+    if engine.index is not None:
+        index = engine.index.select(features, keep)
+    return SimilarityEngine(features, titles, dict(engine.vocabulary), neighbors, neighbor_scores, index,
+                            engine.vectorizer)
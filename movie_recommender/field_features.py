@@ -0,0 +1,180 @@
+import numpy as np
+from scipy import sparse
+
+from .catalog import MISSING_VALUE
+from .similarity_engine import FEATURE_COLUMNS
+
+# Each field and the catalog columns its terms come from; the three actor
+# columns share one field so billing order does not matter
+FIELDS = {
+    "director": ["director_name"],
+    "actor": ["actor_1_name", "actor_2_name", "actor_3_name"],
+    "genre": ["genres"],
+}
+DEFAULT_WEIGHTS = {"director": 1.0, "actor": 1.0, "genre": 1.0}
+WEIGHTINGS = ["count", "tfidf", "bm25"]
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Multi-word genres, written as the one word they are indexed as; genres
+# are otherwise separated by spaces. Science Fiction is the Sci-Fi genre
+# under its TMDb name
+MULTI_WORD_GENRES = {"science fiction": "sci-fi", "tv movie": "tv-movie"}
+
+
+def field_terms(field, value):
+    """Terms one cell adds to a field: the whole name for people, one term per genre"""
+    if not isinstance(value, str) or value == MISSING_VALUE:
+        return []
+    if field == "genre":
+        value = " ".join(value.lower().split())
+        for name, genre in MULTI_WORD_GENRES.items():
+            value = value.replace(name, genre)
+        return [f"genre:{genre}" for genre in value.split()]
+    return [f"{field}:{' '.join(value.lower().split())}"]
+
+
+class FieldVectorizer:
+    """Weighted sparse features with separate fields for director, actors and genres
+
+    Unlike the comb bag of words, a person is one whole-name term, so James
+    Cameron the director only matches James Cameron the director, and
+    missing people match nothing. Terms are weighted by count, TF-IDF or
+    BM25 within their field and scaled by the field's weight before rows
+    are L2-normalized.
+    """
+
+    def __init__(self, weights=None, weighting="tfidf", k1=BM25_K1, b=BM25_B):
+        unknown = set(weights or ()) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}; expected {', '.join(FIELDS)}")
+        if weighting not in WEIGHTINGS:
+            raise ValueError(f"Unknown weighting {weighting!r}; expected one of {', '.join(WEIGHTINGS)}")
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.weighting = weighting
+        self.k1 = k1
+        self.b = b
+        self.n_docs = 0
+        self.idf = np.empty(0)
+        self.avg_lengths = dict.fromkeys(FIELDS, 0.0)
+
+    def params(self):
+        """JSON-serializable settings and statistics; idf is saved separately"""
+        return {
+            "weights": self.weights,
+            "weighting": self.weighting,
+            "k1": self.k1,
+            "b": self.b,
+            "n_docs": self.n_docs,
+            "avg_lengths": self.avg_lengths,
+        }
+
+    @classmethod
+    def from_params(cls, params, idf):
+        vectorizer = cls(params["weights"], params["weighting"], params["k1"], params["b"])
+        vectorizer.n_docs = params["n_docs"]
+        vectorizer.avg_lengths = params["avg_lengths"]
+        vectorizer.idf = idf
+        return vectorizer
+
+    def _term_idf(self, df):
+        if self.weighting == "bm25":
+            return np.log1p((self.n_docs - df + 0.5) / (df + 0.5))
+        # The smoothed IDF of sklearn's TfidfTransformer
+        return np.log((1 + self.n_docs) / (1 + df)) + 1
+
+    def _column_idf(self, n_columns):
+        # Terms added after fitting are weighted as if one movie had them
+        extra = n_columns - len(self.idf)
+        if extra <= 0:
+            return self.idf
+        return np.concatenate([self.idf, np.full(extra, self._term_idf(1.0))])
+
+    def _weigh(self, field, counts):
+        tf = counts.data
+        if self.weighting == "count":
+            weights = tf
+        else:
+            idf = self._column_idf(counts.shape[1])[counts.indices]
+            if self.weighting == "tfidf":
+                weights = tf * idf
+            else:
+                lengths = np.repeat(np.asarray(counts.sum(axis=1)).ravel(), np.diff(counts.indptr))
+                norm = 1 - self.b + self.b * lengths / (self.avg_lengths[field] or 1.0)
+                weights = idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+        return sparse.csr_matrix((weights * self.weights[field], counts.indices, counts.indptr), shape=counts.shape)
+
+    def _combine(self, field_counts):
+        from sklearn.preprocessing import normalize
+
+        features = sum(self._weigh(field, counts) for field, counts in field_counts.items()).tocsr()
+        features.eliminate_zeros()
+        features.sort_indices()
+        return normalize(features, norm="l2", copy=False)
+
+    def fit_transform(self, catalog):
+        """Fit the term statistics on a catalog.Catalog; returns its rows and the vocabulary
+
+        Like Catalog.feature_matrix, each distinct value is split into terms
+        once and rows are assembled from the interned codes.
+        """
+        n_rows = len(catalog)
+        field_codes, value_terms_by_field = {}, {}
+        for field, columns in FIELDS.items():
+            codes = catalog.codes[:, [FEATURE_COLUMNS.index(column) for column in columns]]
+            used, local = np.unique(codes.ravel(), return_inverse=True)
+            field_codes[field] = (len(used), local.reshape(codes.shape))
+            value_terms_by_field[field] = [field_terms(field, catalog.values[code]) for code in used.tolist()]
+        terms = sorted({
+            term for value_terms in value_terms_by_field.values() for tokens in value_terms for term in tokens
+        })
+        vocabulary = {term: column for column, term in enumerate(terms)}
+
+        field_counts = {}
+        for field, (n_used, local) in field_codes.items():
+            value_terms = value_terms_by_field[field]
+            lengths = [len(tokens) for tokens in value_terms]
+            value_matrix = sparse.csr_matrix(
+                (np.ones(sum(lengths)), [vocabulary[term] for tokens in value_terms for term in tokens],
+                 np.concatenate([[0], np.cumsum(lengths)])),
+                shape=(n_used, len(terms)),
+            )
+            width = local.shape[1]
+            row_values = sparse.csr_matrix(
+                (np.ones(n_rows * width), local.ravel(), np.arange(0, n_rows * width + 1, width)),
+                shape=(n_rows, n_used),
+            )
+            field_counts[field] = (row_values @ value_matrix).tocsr()
+
+        self.n_docs = n_rows
+        df = sum(np.bincount(counts.indices, minlength=len(terms)) for counts in field_counts.values())
+        self.idf = self._term_idf(df.astype(np.float64))
+        self.avg_lengths = {field: float(counts.sum()) / max(n_rows, 1) for field, counts in field_counts.items()}
+        return self._combine(field_counts), vocabulary
+
+    def transform(self, data, vocabulary):
+        """Rows for new movies in a DataFrame with the catalog's columns, using the fitted statistics
+
+        As in similarity_engine.vectorize, terms the vocabulary lacks get the
+        next free columns and are returned in column order; vocabulary itself
+        is left unchanged.
+        """
+        added = {}
+        field_counts = {}
+        for field, columns in FIELDS.items():
+            rows, term_columns = [], []
+            for name in columns:
+                for row, value in enumerate(data[name].tolist()):
+                    for term in field_terms(field, value):
+                        column = vocabulary.get(term)
+                        if column is None:
+                            column = added.setdefault(term, len(vocabulary) + len(added))
+                        rows.append(row)
+                        term_columns.append(column)
+            field_counts[field] = (rows, term_columns)
+
+        shape = (len(data), len(vocabulary) + len(added))
+        for field, (rows, term_columns) in field_counts.items():
+            counts = sparse.csr_matrix((np.ones(len(rows)), (rows, term_columns)), shape=shape)
+            counts.sum_duplicates()
+            field_counts[field] = counts
+        return self._combine(field_counts), list(added)
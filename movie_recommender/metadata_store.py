@@ -0,0 +1,138 @@
+import glob
+import json
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from .title_index import normalize_title
+
+METADATA_DIR = "tmdb_metadata"
+CAST_SIZE = 10
+
+FOUND = "found"
+NOT_FOUND = "not_found"
+
+COLUMNS = [
+    "key", "status", "tmdb_id", "imdb_id", "title", "overview", "release_date", "runtime",
+    "vote_average", "vote_count", "genres", "poster_path", "cast", "fetched_at",
+]
+
+
+def make_record(movie_title, details, cast_data):
+    """Flatten TMDb details and credits into one metadata row"""
+    record = dict.fromkeys(COLUMNS)
+    record["key"] = normalize_title(movie_title)
+    record["fetched_at"] = datetime.now().isoformat(timespec="seconds")
+    if not details:
+        record["status"] = NOT_FOUND
+        return record
+
+    cast = [
+        {"name": actor.get("name"), "character": actor.get("character"), "profile_path": actor.get("profile_path")}
+        for actor in (cast_data or {}).get("cast", [])[:CAST_SIZE]
+    ]
+    record.update(
+        status=FOUND,
+        tmdb_id=details.get("id"),
+        imdb_id=details.get("imdb_id"),
+        title=details.get("title"),
+        overview=details.get("overview"),
+        release_date=details.get("release_date"),
+        runtime=details.get("runtime"),
+        vote_average=details.get("vote_average"),
+        vote_count=details.get("vote_count"),
+        genres=json.dumps([genre["name"] for genre in details.get("genres", [])]),
+        poster_path=details.get("poster_path"),
+        cast=json.dumps(cast),
+    )
+    return record
+
+
+def write_part(records, directory=METADATA_DIR):
+    """Append a batch of records to the store as a new Parquet part file"""
+    if not records:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    name = f"part-{datetime.now():%Y%m%dT%H%M%S%f}.parquet"
+    tmp_path = os.path.join(directory, f".{name}")
+    pd.DataFrame(records, columns=COLUMNS).to_parquet(tmp_path, index=False)
+    path = os.path.join(directory, name)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_records(directory=METADATA_DIR):
+    """All stored records, keeping only the latest fetch per title"""
+    parts = sorted(glob.glob(os.path.join(directory, "part-*.parquet")))
+    if not parts:
+        return pd.DataFrame(columns=COLUMNS)
+    frame = pd.concat([pd.read_parquet(part) for part in parts], ignore_index=True)
+    return frame.drop_duplicates("key", keep="last").reset_index(drop=True)
+
+
+def compact(directory=METADATA_DIR):
+    """Merge every part file into one"""
+    old_parts = sorted(glob.glob(os.path.join(directory, "part-*.parquet")))
+    if len(old_parts) <= 1:
+        return len(old_parts)
+    write_part(read_records(directory).to_dict("records"), directory)
+    for part in old_parts:
+        os.remove(part)
+    return 1
+
+
+def _nullable(value):
+    return None if pd.isna(value) else value
+
+
+class MetadataStore:
+    """Read-only view of prefetched TMDb metadata, keyed by normalized title"""
+
+    def __init__(self, directory=METADATA_DIR):
+        frame = read_records(directory)
+        self._records = {record["key"]: record for record in frame.to_dict("records")}
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, title):
+        return normalize_title(title) in self._records
+
+    def get_movie_details(self, title):
+        """(details, cast_data) shaped like the TMDb API responses
+
+        Returns (None, None) for titles TMDb did not know, and None for titles
+        that were never fetched.
+        """
+        record = self._records.get(normalize_title(title))
+        if record is None:
+            return None
+        if record["status"] != FOUND:
+            return None, None
+
+        details = {
+            "id": _nullable(record["tmdb_id"]),
+            "imdb_id": _nullable(record["imdb_id"]),
+            "title": _nullable(record["title"]),
+            "overview": _nullable(record["overview"]),
+            "release_date": _nullable(record["release_date"]),
+            "runtime": _nullable(record["runtime"]),
+            "vote_average": _nullable(record["vote_average"]),
+            "vote_count": _nullable(record["vote_count"]),
+            "genres": [{"name": name} for name in json.loads(record["genres"] or "[]")],
+            "poster_path": _nullable(record["poster_path"]),
+        }
+        for field in ("id", "runtime", "vote_count"):
+            if details[field] is not None:
+                details[field] = int(details[field])
+        return details, {"cast": json.loads(record["cast"] or "[]")}
+
+    def get_poster_paths(self, titles):
+        """Poster path for every stored title in titles; unknown titles are left out"""
+        paths = {}
+        for title in titles:
+            record = self._records.get(normalize_title(title))
+            if record is not None:
+                paths[title] = _nullable(record["poster_path"])
+        return paths
@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+
+import numpy as np
+from scipy import sparse
+
+from .catalog import read_catalog
+from .catalog_updates import append_movies, compact_engine, delete_movies
+from .field_features import FieldVectorizer
+from .neighbor_index import build_index, load_index
+from .quantized_scores import SCORE_DTYPES, QuantizedScores, quantize_scores
+from .similarity_engine import DEFAULT_NEIGHBORS, MEMORY_BUDGET, SimilarityEngine, build_neighbor_table
+from .title_index import TitleIndex
+
+FORMAT_VERSION = 4
+MODEL_DIR = "model"
+MANIFEST = "manifest.json"
+KEEP_VERSIONS = 2
+
+
+def file_sha256(path):
+    """SHA-256 of a file, read in 1 MB chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_json(path, payload):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+
+def _write_array(directory, name, array):
+    tmp_path = os.path.join(directory, f"{name}.tmp.npy")
+    np.save(tmp_path, np.ascontiguousarray(array))
+    os.replace(tmp_path, os.path.join(directory, f"{name}.npy"))
+
+
+def read_manifest(directory=MODEL_DIR):
+    """Manifest of a saved model, or None if there is none"""
+    try:
+        with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def model_version(manifest):
+    """Identifier that changes whenever the saved model does; None without a model"""
+    return None if manifest is None else manifest["version"]
+
+
+def _prune_versions(directory, keep):
+    versions = sorted(
+        entry.name for entry in os.scandir(directory) if entry.is_dir() and not entry.name.startswith(".")
+    )
+    # Processes still mapping an old version keep their pages after unlink
+    for name in versions[:-keep]:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+def save_engine(engine, source_hash, directory=MODEL_DIR, score_dtype="float32"):
+    """Write the engine into a new version directory and point the manifest at it
+
+    Published versions are never modified, so readers that memory-map one
+    always see a consistent model while a rebuild is in progress.
+    score_dtype is how the neighbor scores are stored (see
+    quantized_scores.quantize_scores).
+    """
+    created_at = datetime.now()
+    version = f"{created_at:%Y%m%dT%H%M%S%f}-{source_hash[:12]}"
+    staging = os.path.join(directory, f".{version}")
+    os.makedirs(staging, exist_ok=True)
+    features = engine.features
+
+    _write_array(staging, "features_data", features.data)
+    _write_array(staging, "features_indices", features.indices)
+    _write_array(staging, "features_indptr", features.indptr)
+    if engine.neighbors is not None:
+        codes, scale = quantize_scores(engine.neighbor_scores, score_dtype)
+        _write_array(staging, "neighbors", engine.neighbors)
+        _write_array(staging, "neighbor_scores", codes)
+        if scale is not None:
+            _write_array(staging, "neighbor_score_scale", scale)
+    if engine.index is not None:
+        engine.index.save(staging)
+    if engine.vectorizer is not None:
+        _write_array(staging, "field_idf", engine.vectorizer.idf)
+
+    terms = sorted(engine.vocabulary, key=engine.vocabulary.get) if engine.vocabulary else []
+    _write_json(os.path.join(staging, "vocabulary.json"), terms)
+    _write_json(os.path.join(staging, "titles.json"), engine.titles.titles)
+    os.replace(staging, os.path.join(directory, version))
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "version": version,
+        "source_sha256": source_hash,
+        "shape": list(features.shape),
+        "n_neighbors": 0 if engine.neighbors is None else int(engine.neighbors.shape[1]),
+        "neighbor_score_dtype": score_dtype,
+        "index": None if engine.index is None else engine.index.kind,
+        "field_features": None if engine.vectorizer is None else engine.vectorizer.params(),
+        "created_at": created_at.isoformat(timespec="seconds"),
+    }
+    _write_json(os.path.join(directory, MANIFEST), manifest)
+    _prune_versions(directory, KEEP_VERSIONS)
+    return manifest
+
+
+def load_engine(directory=MODEL_DIR, mmap=True):
+    """Load a saved engine without refitting anything
+
+    With mmap the arrays are read-only memory maps, so every process on the
+    host shares one copy of the model through the page cache.
+    """
+    manifest = read_manifest(directory)
+    if manifest is None or manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"No compatible model found in {directory}")
+    version_dir = os.path.join(directory, manifest["version"])
+
+    def load(name):
+        return np.load(os.path.join(version_dir, f"{name}.npy"), mmap_mode="r" if mmap else None)
+
+    features = sparse.csr_matrix(
+        (load("features_data"), load("features_indices"), load("features_indptr")),
+        shape=tuple(manifest["shape"]),
+        copy=False,
+    )
+    with open(os.path.join(version_dir, "vocabulary.json"), encoding="utf-8") as f:
+        vocabulary = {term: column for column, term in enumerate(json.load(f))}
+    with open(os.path.join(version_dir, "titles.json"), encoding="utf-8") as f:
+        titles = TitleIndex(json.load(f))
+
+    neighbors = neighbor_scores = None
+    if manifest["n_neighbors"]:
+        neighbors = load("neighbors")
+        neighbor_scores = load("neighbor_scores")
+        score_dtype = manifest.get("neighbor_score_dtype", "float32")
+        if score_dtype != "float32":
+            scale = load("neighbor_score_scale") if score_dtype == "uint8" else None
+            neighbor_scores = QuantizedScores(neighbor_scores, scale)
+
+    index = load_index(version_dir, features, mmap) if manifest.get("index") else None
+    vectorizer = None
+    if manifest.get("field_features"):
+        vectorizer = FieldVectorizer.from_params(manifest["field_features"], load("field_idf"))
+    engine = SimilarityEngine(features, titles, vocabulary, neighbors, neighbor_scores, index, vectorizer)
+    engine.manifest = manifest
+    return engine
+
+
+def build_engine(csv_path, directory=MODEL_DIR, n_neighbors=DEFAULT_NEIGHBORS, index="exact", index_params=None,
+                 features="fields", feature_params=None, workers=1, memory_budget=MEMORY_BUDGET, progress=None,
+                 score_dtype="float32"):
+    """Fit the engine from the catalog CSV and publish it as a new version
+
+    index is the neighbor index kind for queries outside the neighbor table
+    ('exact' or 'ivf'), or None for a full product with the catalog.
+    features is 'fields' for field_features.FieldVectorizer, configured by
+    feature_params, or 'comb' for the bag of words over the comb column.
+    workers, memory_budget and progress go to build_neighbor_table, and
+    score_dtype to save_engine.
+    """
+    if features not in ("fields", "comb"):
+        raise ValueError(f"Unknown features {features!r}; expected 'fields' or 'comb'")
+    if score_dtype not in SCORE_DTYPES:
+        raise ValueError(f"Unknown score dtype {score_dtype!r}; expected one of {', '.join(SCORE_DTYPES)}")
+    source_hash = file_sha256(csv_path)
+    vectorizer = FieldVectorizer(**(feature_params or {})) if features == "fields" else None
+    engine = SimilarityEngine.from_catalog(read_catalog(csv_path), 0, vectorizer)
+    if n_neighbors:
+        engine.neighbors, engine.neighbor_scores = build_neighbor_table(
+            engine.features, n_neighbors, workers=workers, memory_budget=memory_budget, progress=progress
+        )
+    if index:
+        engine.index = build_index(index, engine.features, **(index_params or {}))
+    engine.manifest = save_engine(engine, source_hash, directory, score_dtype)
+    return engine
+
+
+def is_up_to_date(csv_path, directory=MODEL_DIR):
+    """Whether the saved model was built from the current CSV in this format"""
+    manifest = read_manifest(directory)
+    return (
+        manifest is not None
+        and manifest.get("format_version") == FORMAT_VERSION
+        and manifest.get("source_sha256") == file_sha256(csv_path)
+    )
+
+
+def load_or_build_engine(csv_path, directory=MODEL_DIR, n_neighbors=DEFAULT_NEIGHBORS):
+    """Load the saved engine, rebuilding it only if the CSV hash changed"""
+    if not is_up_to_date(csv_path, directory):
+        build_engine(csv_path, directory, n_neighbors)
+    # Reload even after a build so this process maps the shared files
+    return load_engine(directory)
+
+
+def update_model(csv_path, directory=MODEL_DIR, append=None, delete=()):
+    """Delete the titles in delete, then append the movies in the DataFrame append, and publish the result
+
+    csv_path is the catalog after the change, whose hash the manifest then
+    records. Only the changed neighbor lists are recomputed, but the model
+    is published as a new compacted version rather than a delta on top of
+    the current one, so readers keep mapping every array without replaying
+    (and privately copying) the changes at load.
+    """
+    source_hash = file_sha256(csv_path)
+    engine = load_engine(directory, mmap=False)
+    if delete:
+        delete_movies(engine, delete)
+    if append is not None and len(append):
+        append_movies(engine, append)
+    score_dtype = engine.manifest.get("neighbor_score_dtype", "float32")
+    engine = compact_engine(engine)
+    engine.manifest = save_engine(engine, source_hash, directory, score_dtype)
+    return engine
@@ -0,0 +1,263 @@
+import json
+import os
+
+import numpy as np
+from scipy import sparse
+
+from .similarity_engine import top_k
+
+INDEX_PARAMS = "index.json"
+N_PROBE = 16
+CENTROID_TERMS = 256
+TRAIN_ITERATIONS = 8
+TRAIN_SAMPLE = 50000
+BLOCK_SIZE = 20000
+
+
+def _save_csr(directory, name, matrix):
+    for part in ("data", "indices", "indptr"):
+        np.save(os.path.join(directory, f"{name}_{part}.npy"), getattr(matrix, part))
+
+
+def _load_csr(directory, name, shape, mmap, kind=sparse.csr_matrix):
+    def load(part):
+        return np.load(os.path.join(directory, f"{name}_{part}.npy"), mmap_mode="r" if mmap else None)
+    return kind((load("data"), load("indices"), load("indptr")), shape=shape, copy=False)
+
+
+def _write_params(directory, params):
+    with open(os.path.join(directory, INDEX_PARAMS), "w", encoding="utf-8") as f:
+        json.dump(params, f)
+
+
+class ExactIndex:
+    """Exact cosine search, accumulating scores over the postings of the query's terms only
+
+    Gives the same scores as a full sparse product with the catalog, in the
+    same summation order, but only touches rows that share a term with the
+    query.
+    """
+
+    kind = "exact"
+
+    def __init__(self, features, postings=None):
+        self.features = features
+        self.postings = features.tocsc() if postings is None else postings
+
+    def scores(self, row):
+        """Cosine similarity of one catalog row against every row"""
+        scores = np.zeros(self.features.shape[0])
+        start, stop = self.features.indptr[row], self.features.indptr[row + 1]
+        indptr, indices, data = self.postings.indptr, self.postings.indices, self.postings.data
+        for column, weight in zip(self.features.indices[start:stop], self.features.data[start:stop]):
+            lo, hi = indptr[column], indptr[column + 1]
+            scores[indices[lo:hi]] += data[lo:hi] * weight
+        return scores
+
+    def query(self, rows, k=10, exclude=None):
+        """(batch, k) nearest rows for catalog rows, never returning the query row itself"""
+        rows = np.asarray(rows, dtype=np.intp).tolist()
+        if not rows:
+            return np.empty((0, k), dtype=np.intp)
+        extra = exclude if exclude is not None else [()] * len(rows)
+        return np.array(
+            [top_k(self.scores(row), k, {row} | set(seen)) for row, seen in zip(rows, extra)],
+            dtype=np.intp,
+        ).reshape(len(rows), -1)
+
+    def extend(self, features):
+        """Cover rows and terms appended to features"""
+        self.features = features
+        self.postings = features.tocsc()
+
+    def select(self, features, rows):
+        """Index of features, which holds only rows of the indexed matrix, renumbered in order"""
+        return ExactIndex(features)
+
+    def save(self, directory):
+        _save_csr(directory, "postings", self.postings)
+        _write_params(directory, {"kind": self.kind})
+
+    @classmethod
+    def load(cls, directory, features, params, mmap=True):
+        return cls(features, _load_csr(directory, "postings", features.shape, mmap, sparse.csc_matrix))
+
+
+def _row_argmax(matrix):
+    # Column of each row's largest entry, lowest column on ties and 0 for empty
+    # rows; avoids sorting the indices of the product like scipy's argmax does
+    result = np.zeros(matrix.shape[0], dtype=np.int32)
+    lengths = np.diff(matrix.indptr)
+    rows = np.flatnonzero(lengths)
+    if len(rows):
+        starts = matrix.indptr[rows]
+        maxima = np.maximum.reduceat(matrix.data, starts)
+        columns = np.where(matrix.data == np.repeat(maxima, lengths[rows]), matrix.indices, matrix.shape[1])
+        result[rows] = np.minimum.reduceat(columns, starts)
+    return result
+
+
+def _prune_rows(matrix, max_terms):
+    # Keep the heaviest terms of each centroid so the index stays small for
+    # large vocabularies, then renormalize for cosine scoring
+    rows = []
+    for i in range(matrix.shape[0]):
+        row = matrix[i]
+        if row.nnz > max_terms:
+            keep = np.argpartition(-row.data, max_terms - 1)[:max_terms]
+            row = sparse.csr_matrix((row.data[keep], row.indices[keep], [0, max_terms]), shape=row.shape)
+        rows.append(row)
+    pruned = sparse.vstack(rows).tocsr()
+    norms = np.sqrt(np.asarray(pruned.multiply(pruned).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return (sparse.diags(1 / norms) @ pruned).tocsr()
+
+
+def _spherical_kmeans(sample, n_lists, iterations, max_terms, rng):
+    centroids = sample[rng.choice(sample.shape[0], n_lists, replace=False)]
+    for _ in range(iterations):
+        assignment = _row_argmax(sample @ centroids.T)
+        members = sparse.csr_matrix(
+            (np.ones(len(assignment)), (assignment, np.arange(len(assignment)))),
+            shape=(n_lists, sample.shape[0]),
+        )
+        sums = (members @ sample).tocsr()
+        empty = np.flatnonzero(np.diff(sums.indptr) == 0)
+        if len(empty):
+            # Lists that lost every member keep their previous centroid
+            sums = sums.tolil()
+            sums[empty] = centroids[empty]
+            sums = sums.tocsr()
+        centroids = _prune_rows(sums, max_terms)
+    return centroids
+
+
+class IVFIndex:
+    """Approximate cosine search over an inverted file of clustered rows
+
+    Rows are grouped into n_lists clusters by spherical k-means on a sample of
+    the catalog. A query scores the cluster centroids, gathers the rows of the
+    n_probe closest clusters and ranks only those by exact cosine, so the cost
+    grows with the cluster size rather than the catalog size.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, features, n_lists=None, n_probe=N_PROBE, centroid_terms=CENTROID_TERMS,
+                 iterations=TRAIN_ITERATIONS, sample_size=TRAIN_SAMPLE, seed=0, block_size=BLOCK_SIZE):
+        n_rows = features.shape[0]
+        self.features = features
+        self.n_lists = min(n_lists or max(int(np.sqrt(n_rows)), 1), n_rows)
+        self.n_probe = n_probe
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        sample = features[np.sort(rng.choice(n_rows, min(sample_size, n_rows), replace=False))]
+        self.centroids = _spherical_kmeans(sample, self.n_lists, iterations, centroid_terms, rng)
+
+        self._set_lists(self._assign(features, block_size))
+
+    def _assign(self, features, block_size=BLOCK_SIZE):
+        assignment = np.empty(features.shape[0], dtype=np.int32)
+        for start in range(0, features.shape[0], block_size):
+            block = features[start:start + block_size] @ self.centroids.T
+            assignment[start:start + block_size] = _row_argmax(block)
+        return assignment
+
+    def _assignment(self):
+        assignment = np.empty(len(self.members), dtype=np.int32)
+        assignment[self.members] = np.repeat(np.arange(self.n_lists, dtype=np.int32), np.diff(self.offsets))
+        return assignment
+
+    def _set_lists(self, assignment):
+        self.members = np.argsort(assignment, kind="stable").astype(np.int32)
+        self.offsets = np.searchsorted(assignment[self.members], np.arange(self.n_lists + 1)).astype(np.int64)
+        self._centroid_postings = self.centroids.tocsc()
+
+    def _widen(self, n_terms):
+        centroids = self.centroids
+        self.centroids = sparse.csr_matrix(
+            (centroids.data, centroids.indices, centroids.indptr), shape=(self.n_lists, n_terms)
+        )
+
+    def extend(self, features):
+        """Assign rows appended to features to their closest lists, keeping the trained centroids"""
+        self._widen(features.shape[1])
+        n_indexed = len(self.members)
+        assignment = np.concatenate([self._assignment(), self._assign(features[n_indexed:])])
+        self.features = features
+        self._set_lists(assignment)
+
+    def select(self, features, rows):
+        """Index of features, which holds only rows of the indexed matrix, renumbered in order"""
+        index = IVFIndex.__new__(IVFIndex)
+        index.features = features
+        index.n_lists = self.n_lists
+        index.n_probe = self.n_probe
+        index.seed = self.seed
+        index.centroids = self.centroids
+        index._widen(features.shape[1])
+        index._set_lists(self._assignment()[rows])
+        return index
+
+    def candidates(self, row, k=10):
+        """Rows of the n_probe closest lists, probing further lists until there are more than k"""
+        start, stop = self.features.indptr[row], self.features.indptr[row + 1]
+        postings = self._centroid_postings[:, self.features.indices[start:stop]]
+        list_scores = postings @ self.features.data[start:stop]
+        order = np.argsort(-list_scores, kind="stable")
+        sizes = np.cumsum(np.diff(self.offsets)[order])
+        n_probe = max(self.n_probe, int(np.searchsorted(sizes, k + 1)) + 1)
+        return np.concatenate([self.members[self.offsets[i]:self.offsets[i + 1]] for i in order[:n_probe]])
+
+    def query(self, rows, k=10, exclude=None):
+        """(batch, k) approximate nearest rows for catalog rows, never returning the query row itself"""
+        rows = np.asarray(rows, dtype=np.intp).tolist()
+        if not rows:
+            return np.empty((0, k), dtype=np.intp)
+        extra = exclude if exclude is not None else [()] * len(rows)
+        result = []
+        for row, seen in zip(rows, extra):
+            candidates = np.sort(self.candidates(row, k + len(seen)))
+            candidates = candidates[~np.isin(candidates, [row, *seen])]
+            # Sorted candidates break score ties by row, like the exact search
+            scores = (self.features[candidates] @ self.features[row].T).toarray().ravel()
+            result.append(candidates[top_k(scores, k)])
+        return np.array(result, dtype=np.intp).reshape(len(rows), -1)
+
+    def save(self, directory):
+        _save_csr(directory, "ivf_centroids", self.centroids)
+        np.save(os.path.join(directory, "ivf_members.npy"), self.members)
+        np.save(os.path.join(directory, "ivf_offsets.npy"), self.offsets)
+        _write_params(directory, {"kind": self.kind, "n_lists": self.n_lists, "n_probe": self.n_probe,
+                                  "seed": self.seed})
+
+    @classmethod
+    def load(cls, directory, features, params, mmap=True):
+        index = cls.__new__(cls)
+        index.features = features
+        index.n_lists = params["n_lists"]
+        index.n_probe = params["n_probe"]
+        index.seed = params["seed"]
+        index.centroids = _load_csr(directory, "ivf_centroids", (index.n_lists, features.shape[1]), mmap)
+        mmap_mode = "r" if mmap else None
+        index.members = np.load(os.path.join(directory, "ivf_members.npy"), mmap_mode=mmap_mode)
+        index.offsets = np.load(os.path.join(directory, "ivf_offsets.npy"), mmap_mode=mmap_mode)
+        index._centroid_postings = index.centroids.tocsc()
+        return index
+
+
+INDEX_TYPES = {ExactIndex.kind: ExactIndex, IVFIndex.kind: IVFIndex}
+
+
+def build_index(kind, features, **params):
+    """Build a neighbor index of the given kind ('exact' or 'ivf')"""
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {kind!r}; expected one of {sorted(INDEX_TYPES)}")
+    return INDEX_TYPES[kind](features, **params)
+
+
+def load_index(directory, features, mmap=True):
+    """Load the index saved in directory alongside features"""
+    with open(os.path.join(directory, INDEX_PARAMS), encoding="utf-8") as f:
+        params = json.load(f)
+    return INDEX_TYPES[params["kind"]].load(directory, features, params, mmap)
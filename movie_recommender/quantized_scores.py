@@ -0,0 +1,65 @@
+import numpy as np
+
+SCORE_DTYPES = ["float32", "float16", "uint8"]
+UINT8_LEVELS = 255
+
+
+def quantize_scores(scores, dtype="float32"):
+    """(codes, scale) storing a (rows, k) neighbor score table as dtype
+
+    uint8 codes are fractions of each row's largest score, which scale
+    holds as float32; scale is None for the float dtypes. uint8 stores
+    scores below zero, like the -inf of rows with fewer than k candidates,
+    as 0.
+    """
+    if dtype not in SCORE_DTYPES:
+        raise ValueError(f"Unknown score dtype {dtype!r}; expected one of {', '.join(SCORE_DTYPES)}")
+    scores = np.asarray(scores, dtype=np.float32)
+    if dtype != "uint8":
+        return scores.astype(dtype), None
+    clipped = np.maximum(np.nan_to_num(scores, neginf=0), 0)
+    scale = clipped.max(axis=1, initial=0)
+    codes = np.rint(clipped / np.where(scale > 0, scale, 1)[:, None] * UINT8_LEVELS)
+    return codes.astype(np.uint8), scale
+
+
+def dequantize_scores(codes, scale=None):
+    """float32 scores from quantize_scores' codes for some rows and those rows' scale"""
+    if scale is None:
+        return np.asarray(codes, dtype=np.float32)
+    return np.asarray(codes, dtype=np.float32) * (np.asarray(scale, dtype=np.float32)[..., None] / UINT8_LEVELS)
+
+
+class QuantizedScores:
+    """Read-only neighbor score table kept as quantize_scores codes and dequantized on access
+
+    Indexing and np.asarray give float32 like the exact table, computed for
+    the rows asked for only, so a memory-mapped table costs nothing until
+    something reads it. Nothing ranks by these scores: the neighbor order
+    is stored exactly, and incremental updates re-score candidates from
+    the features.
+    """
+
+    def __init__(self, codes, scale=None):
+        self.codes = codes
+        self.scale = scale
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + (0 if self.scale is None else self.scale.nbytes)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, key):
+        rows, columns = (key[0], key[1:]) if isinstance(key, tuple) else (key, ())
+        scale = None if self.scale is None else self.scale[rows]
+        return dequantize_scores(self.codes[rows], scale)[(Ellipsis, *columns)]
+
+    def __array__(self, dtype=None, copy=None):
+        scores = self[:]
+        return scores if dtype is None else scores.astype(dtype)
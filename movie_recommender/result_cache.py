@@ -0,0 +1,74 @@
+import threading
+
+from .title_index import normalize_title
+from .tmdb_cache import MISSING, TTLCache
+
+RESULT_ENTRIES = 1024
+
+
+def hit_rate(stats):
+    lookups = stats["hits"] + stats["misses"]
+    return stats["hits"] / lookups if lookups else 0.0
+
+
+class ResultCache:
+    """Ranked recommendations and assembled page payloads shared by every session in a process
+
+    Entries are keyed by (model version, normalized title, k) and evicted
+    least recently used, max_entries per kind. They never expire on their
+    own; all of them are dropped as soon as set_version sees a different
+    model version.
+    """
+
+    def __init__(self, max_entries=RESULT_ENTRIES):
+        self.recommendations = TTLCache(max_entries, ttl=None)
+        self.pages = TTLCache(max_entries, ttl=None)
+        self.version = None
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def set_version(self, version):
+        """Key entries by version from now on, dropping those of any other model"""
+        with self._lock:
+            if version == self.version:
+                return
+            if self.version is not None:
+                self.invalidations += 1
+            self.recommendations.clear()
+            self.pages.clear()
+            self.version = version
+
+    def _key(self, title, k):
+        return (self.version, normalize_title(title), k)
+
+    def get_recommendations(self, title, k, compute):
+        """Cached ranking for title, or compute() stored for the next caller (None included)"""
+        key = self._key(title, k)
+        value = self.recommendations.get(key)
+        if value is MISSING:
+            value = compute()
+            self.recommendations.set(key, value)
+        return value
+
+    def get_page(self, title, k):
+        """Cached page payload for title, or MISSING"""
+        return self.pages.get(self._key(title, k))
+
+    def set_page(self, title, k, page):
+        self.pages.set(self._key(title, k), page)
+
+    def stats(self):
+        recommendations = self.recommendations.stats()
+        pages = self.pages.stats()
+        return {
+            "recommendation_hits": recommendations["hits"],
+            "recommendation_misses": recommendations["misses"],
+            "recommendation_hit_rate": hit_rate(recommendations),
+            "recommendation_size": recommendations["size"],
+            "page_hits": pages["hits"],
+            "page_misses": pages["misses"],
+            "page_hit_rate": hit_rate(pages),
+            "page_size": pages["size"],
+            "evictions": recommendations["evictions"] + pages["evictions"],
+            "invalidations": self.invalidations,
+        }
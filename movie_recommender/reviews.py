@@ -0,0 +1,126 @@
+import io
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from lxml import etree
+
+from .sentiment import keyword_sentiments
+from .tmdb_cache import MISSING, TTLCache
+from .tracing import count, stage
+
+IMDB_REVIEWS_URL = os.environ.get("IMDB_REVIEWS_URL", "https://www.imdb.com/title/{imdb_id}/reviews/?ref_=tt_ov_rt")
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/85.0.4183.83 Safari/537.36"
+)
+REVIEW_CLASS = "ipc-html-content-inner-div"
+MAX_REVIEWS = 10
+FETCH_TIMEOUT = (3, 5)
+CACHE_TTL = 60 * 60
+MAX_WORKERS = 4
+
+
+def _single_string(element):
+    # Mirrors BeautifulSoup's .string: the text of an element whose only
+    # content is one string, possibly wrapped in a chain of single children
+    if len(element) == 0:
+        return element.text or None
+    if len(element) == 1 and not (element.text or "").strip() and not (element[0].tail or "").strip():
+        return _single_string(element[0])
+    return None
+
+
+def parse_reviews(html, limit=MAX_REVIEWS):
+    """Review texts from an IMDb reviews page, parsed incrementally and stopping after limit"""
+    if isinstance(html, str):
+        html = html.encode("utf-8")
+    texts = []
+    try:
+        for _, element in etree.iterparse(io.BytesIO(html), events=("end",), tag="div", html=True,
+                                          recover=True):
+            if REVIEW_CLASS not in (element.get("class") or "").split():
+                continue
+            text = _single_string(element)
+            if text:
+                texts.append(text)
+                if len(texts) == limit:
+                    break
+    except etree.XMLSyntaxError:
+        pass
+    return texts
+
+
+class ReviewPipeline:
+    """Fetches, parses and scores IMDb reviews in the background, caching results per imdb_id
+
+    scorer is a sentiment.SentimentScorer, or None for keyword scoring.
+    """
+
+    def __init__(self, scorer=None, url_template=IMDB_REVIEWS_URL, timeout=FETCH_TIMEOUT,
+                 ttl=CACHE_TTL, max_workers=MAX_WORKERS):
+        self.scorer = scorer
+        self.url_template = url_template
+        self.timeout = timeout
+        self.cache = TTLCache(ttl=ttl)
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="reviews")
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def fetch(self, imdb_id):
+        """Review texts for imdb_id; [] if IMDb has no reviews page for it
+
+        Any other failed response (IMDb's 403/503 bot blocks, server errors)
+        raises requests.HTTPError, so like a timeout it is not cached.
+        """
+        count("imdb_http_requests")
+        with stage("imdb_fetch"):
+            response = self.session.get(self.url_template.format(imdb_id=imdb_id), timeout=self.timeout)
+        if response.status_code != 200:
+            count("imdb_http_errors")
+            if response.status_code == 404:
+                return []
+            response.raise_for_status()
+        with stage("review_parse"):
+            return parse_reviews(response.content)
+
+    def score(self, texts):
+        with stage("review_scoring"):
+            if self.scorer is not None:
+                try:
+                    sentiments, _ = self.scorer.score(texts)
+                except Exception:
+                    sentiments = keyword_sentiments(texts)
+            else:
+                sentiments = keyword_sentiments(texts)
+        return [{"text": text, "sentiment": sentiment} for text, sentiment in zip(texts, sentiments)]
+
+    def _load(self, imdb_id):
+        try:
+            reviews = self.score(self.fetch(imdb_id))
+            self.cache.set(imdb_id, reviews)
+            return reviews
+        finally:
+            with self._lock:
+                self._pending.pop(imdb_id, None)
+
+    def submit(self, imdb_id):
+        """Future for the scored reviews of imdb_id; cached and in-flight requests are shared"""
+        reviews = self.cache.get(imdb_id)
+        with self._lock:
+            if reviews is not MISSING:
+                future = Future()
+                future.set_result(reviews)
+            else:
+                future = self._pending.get(imdb_id)
+                if future is None:
+                    future = self._executor.submit(self._load, imdb_id)
+                    self._pending[imdb_id] = future
+        return future
+
+    def get(self, imdb_id, timeout=None):
+        """Scored reviews, waiting at most timeout seconds (raises TimeoutError)"""
+        return self.submit(imdb_id).result(timeout=timeout)
@@ -0,0 +1,159 @@
+import pickle
+import re
+
+import numpy as np
+
+BATCH_SIZE = 1000
+
+POSITIVE_WORDS = frozenset([
+    "good", "great", "excellent", "amazing", "awesome", "fantastic", "wonderful", "brilliant", "perfect",
+    "outstanding", "superb", "magnificent", "incredible", "spectacular", "marvelous", "love", "loved", "like",
+    "enjoy", "enjoyed", "best", "better", "beautiful", "stunning", "impressive", "remarkable", "extraordinary",
+])
+NEGATIVE_WORDS = frozenset([
+    "bad", "terrible", "awful", "horrible", "worst", "hate", "hated", "boring", "disappointing", "poor", "weak",
+    "stupid", "ridiculous", "pathetic", "waste", "sucks", "sucked", "disgusting", "annoying", "irritating",
+    "frustrating", "mediocre", "bland", "dull", "confusing",
+])
+NEGATORS = frozenset([
+    "not", "no", "never", "nothing", "hardly", "barely", "neither", "nor", "without", "cannot",
+])
+NEGATION_WINDOW = 3
+
+
+# Per UTF-8 byte of a lowercased text whose non-ASCII characters are all
+# word characters: spaces stay, clause breaks become newlines and every
+# other non-word character a tab, so bytes.split finds whole words as \b does
+_SEPARATORS = bytes(
+    char if char >= 128 or chr(char).isalnum() or chr(char) in "_ " else ord("\n") if chr(char) in ".,;:!?"
+    else ord("\t")
+    for char in range(256)
+)
+_ASCII = bytes(range(128))
+_NON_ASCII_SEPARATOR_RE = re.compile(r"(?![\x00-\x7f])\W")
+_POLARITY = {**dict.fromkeys(map(str.encode, POSITIVE_WORDS), 1), **dict.fromkeys(map(str.encode, NEGATIVE_WORDS), -1)}
+_NEGATORS = frozenset(map(str.encode, NEGATORS))
+# Negators score 0, so one lookup finds every word of interest
+_SCORES = {**dict.fromkeys(_NEGATORS, 0), **_POLARITY}
+_SPACES = bytes.maketrans(b"\t\n", b"  ")
+# Words starting within NEGATION_WINDOW spaces, up to the end of the clause
+_NEGATION_WINDOW_RE = re.compile(rb"[^ \n]*(?: [^ \n]*){0,%d}" % NEGATION_WINDOW)
+
+
+def _upgrade_legacy_tfidf(vectorizer):
+    # tranform.pkl was pickled with scikit-learn 0.23, which kept the IDF weights
+    # in a sparse diagonal instead of idf_; newer versions then refuse to transform
+    tfidf = getattr(vectorizer, "_tfidf", None)
+    if tfidf is not None and not hasattr(tfidf, "idf_") and hasattr(tfidf, "_idf_diag"):
+        tfidf.idf_ = np.asarray(tfidf._idf_diag.diagonal())
+    return vectorizer
+
+
+def load_sentiment_models(model_path="nlp_model.pkl", vectorizer_path="tranform.pkl"):
+    """Load the pickled sentiment classifier and its text vectorizer"""
+    with open(model_path, "rb") as f:
+        nlp_model = pickle.load(f)
+    with open(vectorizer_path, "rb") as f:
+        vectorizer = _upgrade_legacy_tfidf(pickle.load(f))
+    return nlp_model, vectorizer
+
+
+def _split_words(text):
+    """Lowercased text with n't expanded, as UTF-8 translated by _SEPARATORS
+
+    Non-ASCII characters that are not word characters become tabs first,
+    which leaves only ASCII bytes for _SEPARATORS to classify. Most texts
+    have none, and no non-ASCII character that lowercasing changes, which
+    the non-ASCII bytes alone show; then lowercasing the bytes is enough.
+    """
+    data = text.encode("utf-8")
+    others = "" if text.isascii() else data.translate(None, _ASCII).decode("utf-8")
+    if _NON_ASCII_SEPARATOR_RE.search(others) or others.lower() != others:
+        data = _NON_ASCII_SEPARATOR_RE.sub("\t", text.lower()).encode("utf-8")
+    else:
+        data = data.lower()
+    return data.replace(b"n't", b" not").translate(_SEPARATORS)
+
+
+def _negated_polarity(words, start):
+    """Summed polarity of the words a negation ending at start flips"""
+    polarity = 0
+    for word in _NEGATION_WINDOW_RE.match(words, start).group().split():
+        if word in _NEGATORS:
+            # From here on the later negation decides
+            break
+        polarity += _POLARITY.get(word, 0)
+    return polarity
+
+
+def _keyword_score(words):
+    """Keyword score of a text from _split_words, tallying words in C and looking only after each negation"""
+    found = list(filter(_SCORES.__contains__, words.split()))
+    score = sum(map(_SCORES.__getitem__, found))
+    negators = _NEGATORS.intersection(found)
+    if not negators:
+        return score
+
+    # With every separator a space and spaces around the text, " not " only
+    # finds whole words; offsets are one more than in words
+    spaced = b" " + words.translate(_SPACES) + b" "
+    for negator in negators:
+        needle = b" " + negator + b" "
+        at = spaced.find(needle)
+        while at != -1:
+            end = at + len(negator)
+            score -= 2 * _negated_polarity(words, end)
+            # The trailing space can lead the next match
+            at = spaced.find(needle, end + 1)
+    return score
+
+
+def keyword_sentiments(texts):
+    """Keyword-based labels for many texts
+
+    Matches whole words only (so 'unlikely' is not 'like'), and flips the
+    polarity of sentiment words within a few words after a negation such as
+    'not' or "didn't", up to the end of the clause.
+    """
+    labels = []
+    for text in texts:
+        score = _keyword_score(_split_words(text))
+        labels.append("Positive" if score > 0 else "Negative" if score < 0 else "Neutral")
+    return labels
+
+
+def simple_sentiment_analysis(text):
+    """Simple sentiment analysis using keyword matching"""
+    return keyword_sentiments([text])[0]
+
+
+class SentimentScorer:
+    """Scores reviews with the sentiment model a whole batch per call"""
+
+    def __init__(self, nlp_model, vectorizer, batch_size=BATCH_SIZE):
+        self.nlp_model = nlp_model
+        self.vectorizer = vectorizer
+        self.batch_size = batch_size
+        self._positive_column = int(np.flatnonzero(nlp_model.classes_ == 1)[0])
+
+    def score(self, texts):
+        """Labels ('Positive'/'Negative') and positive-class probabilities for texts"""
+        texts = list(texts)
+        if not texts:
+            return [], np.empty(0)
+        probabilities = self.nlp_model.predict_proba(self.vectorizer.transform(texts))[:, self._positive_column]
+        # Same decision as predict() for the binary model, without a second pass
+        labels = np.where(probabilities > 0.5, "Positive", "Negative").tolist()
+        return labels, probabilities
+
+    def score_batches(self, texts, batch_size=None):
+        """Yield (labels, probabilities) per batch of an arbitrarily long iterable of texts"""
+        batch_size = batch_size or self.batch_size
+        batch = []
+        for text in texts:
+            batch.append(text)
+            if len(batch) == batch_size:
+                yield self.score(batch)
+                batch = []
+        if batch:
+            yield self.score(batch)
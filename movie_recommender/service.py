@@ -0,0 +1,48 @@
+import os
+
+from .model_store import MODEL_DIR, load_or_build_engine
+from .sentiment import SentimentScorer, keyword_sentiments, load_sentiment_models
+
+CSV_PATH = os.environ.get("MOVIE_DATA_CSV", "main_data.csv")
+
+
+class RecommendationService:
+    """Recommendations and review sentiment as plain dicts, for the API and batch jobs
+
+    The model and sentiment models are loaded once per instance; create one
+    per process.
+    """
+
+    def __init__(self, csv_path=CSV_PATH, model_dir=MODEL_DIR):
+        self.engine = load_or_build_engine(csv_path, model_dir)
+        try:
+            self.scorer = SentimentScorer(*load_sentiment_models())
+        except Exception:
+            self.scorer = None
+
+    def recommend(self, titles, k):
+        """Recommendations per title, with the catalog title each resolved to as match"""
+        catalog = self.engine.titles
+        rows = [catalog.resolve(title) for title in titles]
+        found = [row for row in rows if row is not None]
+        ranked = iter(self.engine.similar_batch(found, k) if found else [])
+        results = []
+        for title, row in zip(titles, rows):
+            if row is None:
+                results.append({"title": title, "error": "not found"})
+            else:
+                recommendations = [catalog[i] for i in next(ranked)]
+                results.append({"title": title, "match": catalog[row], "recommendations": recommendations})
+        return results
+
+    def recommend_from_history(self, titles, weights, dislikes, k):
+        return self.engine.recommend_from_history(titles, weights, dislikes, k)
+
+    def sentiment(self, reviews):
+        if self.scorer is None:
+            return [{"sentiment": label, "probability": None} for label in keyword_sentiments(reviews)]
+        labels, probabilities = self.scorer.score(reviews)
+        return [
+            {"sentiment": label, "probability": round(float(probability), 4)}
+            for label, probability in zip(labels, probabilities)
+        ]
@@ -0,0 +1,338 @@
+import numpy as np
+from scipy import sparse
+
+from .title_index import TitleIndex
+
+DEFAULT_NEIGHBORS = 50
+# Bytes per score while a block is ranked: the dense scores, their negation
+# and argpartition's indices, with room for the sparse product
+BYTES_PER_SCORE = 32
+MEMORY_BUDGET = 512 << 20
+DISLIKE_WEIGHT = 1.0
+FEATURE_COLUMNS = ['actor_1_name', 'actor_2_name', 'actor_3_name', 'director_name', 'genres']
+
+
+def combine_features(data):
+    """The comb column of main_data.csv: actors, director and genres, with 'unknown' for gaps"""
+    return data[FEATURE_COLUMNS].fillna('unknown').astype(str).agg(' '.join, axis=1)
+
+
+def build_feature_matrix(comb):
+    """Vectorize the combined feature column into L2-normalized sparse rows"""
+    # sklearn is only needed to fit or extend a model, not to load or query one
+    from sklearn.feature_extraction.text import CountVectorizer
+    from sklearn.preprocessing import normalize
+
+    cv = CountVectorizer()
+    count_matrix = cv.fit_transform(comb)
+    features = normalize(count_matrix.astype(np.float64), norm='l2', copy=False)
+    return features.tocsr(), cv.vocabulary_
+
+
+def vectorize(comb, vocabulary):
+    """L2-normalized rows for new texts against a fitted vocabulary, without refitting it
+
+    Terms the vocabulary lacks get the next free columns. Returns the rows,
+    which are as wide as the extended vocabulary, and the new terms in
+    column order; vocabulary itself is left unchanged.
+    """
+    from sklearn.feature_extraction.text import CountVectorizer
+    from sklearn.preprocessing import normalize
+
+    analyzer = CountVectorizer().build_analyzer()
+    added = {}
+    rows, columns = [], []
+    for row, text in enumerate(comb):
+        for term in analyzer(text):
+            column = vocabulary.get(term)
+            if column is None:
+                column = added.setdefault(term, len(vocabulary) + len(added))
+            rows.append(row)
+            columns.append(column)
+    counts = sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, columns)), shape=(len(comb), len(vocabulary) + len(added))
+    )
+    counts.sum_duplicates()
+    return normalize(counts, norm='l2', copy=False), list(added)
+
+
+def _apply_exclusions(scores, exclude):
+    if exclude is None:
+        return scores
+    scores = np.array(scores, dtype=np.float64)
+    if len(exclude) and not np.isscalar(next(iter(exclude))):
+        # One exclusion set per row
+        for row, excluded in enumerate(exclude):
+            scores[row, list(excluded)] = -np.inf
+    else:
+        scores[:, list(exclude)] = -np.inf
+    return scores
+
+
+def top_k(scores, k=10, exclude=None):
+    """Indices of the k highest scores, ties going to the lower index
+
+    scores is a 1-D array for a single query or a (batch, n) array for many.
+    exclude is either one set of indices applied to every row or a sequence
+    with one set per row; excluded entries only appear if fewer than k
+    others remain.
+    """
+    single = np.ndim(scores) == 1
+    scores = np.atleast_2d(scores)
+    scores = _apply_exclusions(scores, exclude)
+    n_rows, n_cols = scores.shape
+    k = min(k, n_cols)
+    if k <= 0:
+        selected = np.empty((n_rows, 0), dtype=np.intp)
+        return selected[0] if single else selected
+
+    if k < n_cols:
+        selected = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        kth = np.take_along_axis(scores, selected, axis=1).min(axis=1)
+        # argpartition picks arbitrarily among values tied with the k-th score,
+        # so fill those rows with the lowest tied indices instead
+        tied_rows = np.flatnonzero((scores >= kth[:, None]).sum(axis=1) > k)
+        for row in tied_rows:
+            above = np.flatnonzero(scores[row] > kth[row])
+            tied = np.flatnonzero(scores[row] == kth[row])[:k - len(above)]
+            selected[row] = np.concatenate([above, tied])
+    else:
+        selected = np.tile(np.arange(n_cols), (n_rows, 1))
+
+    selected_scores = np.take_along_axis(scores, selected, axis=1)
+    order = np.lexsort((selected, -selected_scores), axis=-1)
+    selected = np.take_along_axis(selected, order, axis=1)
+    return selected[0] if single else selected
+
+
+def neighbor_block_size(n_columns, memory_budget=MEMORY_BUDGET, workers=1):
+    """Rows per block that keep each worker's share of memory_budget, in bytes, for its dense scores"""
+    return max(1, memory_budget // (max(workers, 1) * max(n_columns, 1) * BYTES_PER_SCORE))
+
+
+def _neighbor_block(features, block_rows, k, excluded):
+    block = (features[block_rows] @ features.T).toarray()
+    block[np.arange(len(block_rows)), block_rows] = -np.inf
+    block[:, excluded] = -np.inf
+    top = top_k(block, k)
+    return top, np.take_along_axis(block, top, axis=1)
+
+
+# Set in each pool worker by _init_worker, so the features are sent once per
+# worker rather than once per block
+_worker_args = None
+
+
+def _init_worker(features, k, excluded):
+    global _worker_args
+    _worker_args = (features, k, excluded)
+
+
+def _worker_block(block_rows):
+    features, k, excluded = _worker_args
+    return _neighbor_block(features, block_rows, k, excluded)
+
+
+def build_neighbor_table(features, k=DEFAULT_NEIGHBORS, block_size=None, rows=None, exclude=(), workers=1,
+                         memory_budget=MEMORY_BUDGET, progress=None):
+    """Precompute the top-k neighbors of every row, one block of rows at a time
+
+    rows limits the table to some rows (in that order) and exclude holds
+    rows that never appear as neighbors, e.g. deleted movies.
+
+    Each block is one sparse product with the whole catalog, ranked densely.
+    block_size defaults to as many rows as keep that within memory_budget
+    bytes, so peak memory stays flat as the catalog grows. With workers > 1
+    the blocks go to a process pool, each worker holding a copy of features
+    and an equal share of the budget. progress(done, total) is called with
+    the rows finished after every block. The table does not depend on the
+    block size or the worker count.
+    """
+    n_rows = features.shape[0]
+    rows = np.arange(n_rows) if rows is None else np.asarray(rows, dtype=np.intp)
+    k = min(k, n_rows - 1)
+    indices = np.empty((len(rows), k), dtype=np.int32)
+    scores = np.empty((len(rows), k), dtype=np.float32)
+    excluded = np.fromiter(exclude, dtype=np.intp, count=len(exclude))
+
+    block_size = block_size or neighbor_block_size(n_rows, memory_budget, workers)
+    starts = range(0, len(rows), block_size)
+    blocks = (rows[start:start + block_size] for start in starts)
+    if workers > 1 and len(starts) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        pool = ProcessPoolExecutor(min(workers, len(starts)), initializer=_init_worker,
+                                   initargs=(features, k, excluded))
+        results = pool.map(_worker_block, blocks)
+    else:
+        pool = None
+        results = (_neighbor_block(features, block_rows, k, excluded) for block_rows in blocks)
+
+    try:
+        for start, (top, top_scores) in zip(starts, results):
+            indices[start:start + block_size] = top
+            scores[start:start + block_size] = top_scores
+            if progress is not None:
+                progress(min(start + block_size, len(rows)), len(rows))
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    return indices, scores
+
+
+class SimilarityEngine:
+    """Cosine similarity over sparse features, scored on demand per query
+
+    Queries the neighbor table covers are answered from it; the rest go to
+    index (see neighbor_index), or to a full product with the catalog if
+    there is none. vectorizer is the field_features.FieldVectorizer the
+    features came from, or None for the comb bag of words.
+    """
+
+    def __init__(self, features, titles, vocabulary=None, neighbors=None, neighbor_scores=None, index=None,
+                 vectorizer=None):
+        self.features = features
+        self.titles = titles
+        self.vocabulary = vocabulary
+        self.vectorizer = vectorizer
+        self.manifest = None
+        self.neighbors = neighbors
+        self.neighbor_scores = neighbor_scores
+        self.index = index
+
+    @classmethod
+    def from_dataframe(cls, data, n_neighbors=DEFAULT_NEIGHBORS):
+        features, vocabulary = build_feature_matrix(data['comb'])
+        return cls.from_features(features, data['movie_title'], vocabulary, n_neighbors)
+
+    @classmethod
+    def from_catalog(cls, catalog, n_neighbors=DEFAULT_NEIGHBORS, vectorizer=None):
+        """Engine for a catalog.Catalog, vectorized straight from its interned codes
+
+        vectorizer is an unfitted FieldVectorizer, or None for the comb bag
+        of words.
+        """
+        if vectorizer is None:
+            features, vocabulary = catalog.feature_matrix()
+        else:
+            features, vocabulary = vectorizer.fit_transform(catalog)
+        return cls.from_features(features, catalog.titles, vocabulary, n_neighbors, vectorizer)
+
+    @classmethod
+    def from_features(cls, features, titles, vocabulary=None, n_neighbors=DEFAULT_NEIGHBORS, vectorizer=None):
+        titles = TitleIndex(titles)
+        neighbors = neighbor_scores = None
+        if n_neighbors:
+            neighbors, neighbor_scores = build_neighbor_table(features, n_neighbors)
+        return cls(features, titles, vocabulary, neighbors, neighbor_scores, vectorizer=vectorizer)
+
+    def __len__(self):
+        return self.features.shape[0]
+
+    @property
+    def deleted(self):
+        """Rows removed from the catalog since the model was last compacted"""
+        return self.titles.deleted
+
+    def scores(self, idx):
+        """Cosine similarity of one row, or a list of rows, against the whole catalog"""
+        scores = (self.features[idx] @ self.features.T).toarray()
+        return scores.ravel() if np.ndim(idx) == 0 else scores
+
+    def _from_table(self, idx, k, excluded):
+        if self.neighbors is None:
+            return None
+        row = self.neighbors[idx]
+        if excluded:
+            row = row[~np.isin(row, list(excluded))]
+        return row[:k] if len(row) >= k else None
+
+    def similar(self, idx, k=10, exclude=None):
+        """Indices of the k most similar rows to idx, excluding idx itself and exclude"""
+        seen = set(exclude or ())
+        cached = self._from_table(idx, k, seen)
+        if cached is not None:
+            return cached
+        seen |= self.deleted
+        if self.index is not None:
+            return self.index.query([idx], k, [seen])[0]
+        return top_k(self.scores(idx), k, seen | {idx})
+
+    def similar_batch(self, indices, k=10, exclude=None):
+        """(batch, k) array with the k most similar rows for each query row
+
+        exclude optionally holds one extra exclusion set per query, e.g. the
+        movies a user has already seen.
+        """
+        indices = np.asarray(indices, dtype=np.intp)
+        extra = list(exclude) if exclude is not None else [()] * len(indices)
+        excluded = [{idx} | set(seen) for idx, seen in zip(indices.tolist(), extra)]
+
+        rows = [self._from_table(idx, k, set(seen)) for idx, seen in zip(indices.tolist(), extra)]
+        if rows and all(row is not None for row in rows):
+            return np.vstack(rows)
+        if self.deleted:
+            extra = [set(seen) | self.deleted for seen in extra]
+            excluded = [seen | self.deleted for seen in excluded]
+        if self.index is not None:
+            return self.index.query(indices, k, extra)
+        return top_k(self.scores(indices), k, excluded)
+
+    def recommend(self, titles, k=10):
+        """Recommended titles for each query title, or None where a title is not in the catalog"""
+        rows = [self.titles.resolve(title) for title in titles]
+        found = [row for row in rows if row is not None]
+        ranked = iter(self.similar_batch(found, k) if found else [])
+        return [
+            None if row is None else [self.titles[i] for i in next(ranked)]
+            for row in rows
+        ]
+
+    def history_scores(self, rows, weights=None):
+        """Scores of every row against a weighted profile of rows; negative weights push away
+
+        The profile is a single sparse vector, so the cost is one sparse
+        matrix-vector product however long the history is.
+        """
+        rows = np.asarray(rows, dtype=np.intp)
+        weights = np.ones(len(rows)) if weights is None else np.asarray(weights, dtype=np.float64)
+        profile = sparse.csr_matrix(weights[None, :]) @ self.features[rows]
+        return (self.features @ profile.T).toarray().ravel()
+
+    def similar_to_history(self, rows, weights=None, k=10, exclude=None):
+        """Indices of up to k rows scoring above zero for a weighted history, excluding the history itself
+
+        Rows with a non-finite weight are ignored, and without a positive
+        weight there is nothing to recommend.
+        """
+        rows = np.asarray(rows, dtype=np.intp)
+        weights = np.ones(len(rows)) if weights is None else np.asarray(weights, dtype=np.float64)
+        usable = np.isfinite(weights)
+        if not (weights[usable] > 0).any():
+            return np.empty(0, dtype=np.intp)
+        scores = self.history_scores(rows[usable], weights[usable])
+        scores[list(set(rows.tolist()) | set(exclude or ()) | self.deleted)] = -np.inf
+        top = top_k(scores, k)
+        return top[scores[top] > 0]
+
+    def recommend_from_history(self, titles, weights=None, dislikes=(), k=10):
+        """Recommended titles for a watch history of titles, optionally weighted and with disliked titles
+
+        Titles that are not in the catalog are ignored. weights, if given,
+        has one weight per title; a ValueError is raised otherwise.
+        """
+        titles = list(titles)
+        weights = [1.0] * len(titles) if weights is None else list(weights)
+        if len(weights) != len(titles):
+            raise ValueError(f"Got {len(weights)} weights for {len(titles)} titles; expected one per title")
+        dislikes = list(dislikes)
+        rows, row_weights = [], []
+        for title, weight in list(zip(titles, weights)) + [(title, -DISLIKE_WEIGHT) for title in dislikes]:
+            row = self.titles.resolve(title)
+            if row is not None:
+                rows.append(row)
+                row_weights.append(weight)
+        if not rows:
+            return []
+        return [self.titles[i] for i in self.similar_to_history(rows, row_weights, k)]
@@ -0,0 +1,123 @@
+import bisect
+import difflib
+from collections import Counter, defaultdict
+
+PREFIX_CANDIDATES = 50
+FUZZY_CANDIDATES = 20
+FUZZY_CUTOFF = 0.75
+
+
+def normalize_title(title):
+    """Lowercase a title and collapse runs of whitespace"""
+    return " ".join(str(title).lower().split())
+
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleIndex:
+    """Constant-time title to row lookup with prefix and fuzzy fallbacks
+
+    Duplicate titles resolve to their first row, the same row the old
+    DataFrame mask lookup picked. Titles are first matched verbatim
+    (lowercased) so entries that only differ by stray padding keep their
+    own rows, then by normalized form. Rows in deleted keep their titles
+    but are never looked up.
+    """
+
+    def __init__(self, titles, deleted=()):
+        self.titles = list(titles)
+        self.deleted = frozenset(deleted)
+        self._exact = {}
+        self._rows = {}
+        for row, title in enumerate(self.titles):
+            if row in self.deleted:
+                continue
+            self._exact.setdefault(str(title).lower(), row)
+            self._rows.setdefault(normalize_title(title), row)
+
+        self._keys = sorted(self._rows)
+        self._postings = None
+
+    def __len__(self):
+        return len(self.titles) - len(self.deleted)
+
+    def __getitem__(self, row):
+        return self.titles[row]
+
+    def __contains__(self, title):
+        return self.lookup(title) is not None
+
+    def active_titles(self):
+        """Titles of the rows that are not deleted, in row order"""
+        if not self.deleted:
+            return self.titles
+        return [title for row, title in enumerate(self.titles) if row not in self.deleted]
+
+    def rows_for(self, titles):
+        """Every row whose normalized title is one of titles, duplicates included"""
+        keys = {normalize_title(title) for title in titles}
+        return [
+            row for row, title in enumerate(self.titles)
+            if row not in self.deleted and normalize_title(title) in keys
+        ]
+
+    def lookup(self, title):
+        """Row of an exact title match, or None"""
+        row = self._exact.get(str(title).lower())
+        if row is None:
+            row = self._rows.get(normalize_title(title))
+        return row
+
+    def prefix_matches(self, prefix, limit=PREFIX_CANDIDATES):
+        """Normalized titles starting with prefix, in alphabetical order"""
+        prefix = normalize_title(prefix)
+        if not prefix:
+            return []
+        start = bisect.bisect_left(self._keys, prefix)
+        matches = []
+        for key in self._keys[start:start + limit]:
+            if not key.startswith(prefix):
+                break
+            matches.append(key)
+        return matches
+
+    def fuzzy_matches(self, title, n=5, cutoff=FUZZY_CUTOFF):
+        """Closest normalized titles by trigram overlap, best first"""
+        if self._postings is None:
+            # Only built on the first fuzzy lookup, which keeps cold loads fast
+            self._postings = defaultdict(list)
+            for position, candidate in enumerate(self._keys):
+                for gram in _trigrams(candidate):
+                    self._postings[gram].append(position)
+
+        key = normalize_title(title)
+        shared = Counter()
+        for gram in _trigrams(key):
+            shared.update(self._postings.get(gram, ()))
+
+        candidates = [self._keys[position] for position, _ in shared.most_common(FUZZY_CANDIDATES)]
+        scored = []
+        for candidate in candidates:
+            ratio = difflib.SequenceMatcher(None, key, candidate).ratio()
+            if ratio >= cutoff:
+                scored.append((-ratio, self._rows[candidate], candidate))
+        return [candidate for _, _, candidate in sorted(scored)[:n]]
+
+    def resolve(self, title, fuzzy=True):
+        """Row for a title, falling back to the shortest prefix match and then the closest fuzzy match"""
+        row = self.lookup(title)
+        if row is not None or not fuzzy:
+            return row
+
+        prefixed = self.prefix_matches(title)
+        if prefixed:
+            best = min(prefixed, key=lambda key: (len(key), self._rows[key]))
+            return self._rows[best]
+
+        close = self.fuzzy_matches(title, n=1)
+        if close:
+            return self._rows[close[0]]
+        return None
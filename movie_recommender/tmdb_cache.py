@@ -0,0 +1,164 @@
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL = 24 * 60 * 60
+NEGATIVE_TTL = 10 * 60
+MEMORY_ENTRIES = 2048
+# Writes to the SQLite store between deletions of its expired rows
+PURGE_EVERY = 1000
+CACHE_PATH = os.environ.get("TMDB_CACHE_PATH", "tmdb_cache.sqlite")
+
+MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe in-process LRU cache whose entries expire after a TTL (None for never)"""
+
+    def __init__(self, max_entries=MEMORY_ENTRIES, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > time.time()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=MISSING):
+        ttl = self.ttl if ttl is MISSING else ttl
+        expires_at = None if ttl is None else time.time() + ttl
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self._entries)}
+
+
+class SQLiteStore:
+    """JSON key-value store in SQLite, shared by every process on the host
+
+    Expired rows are deleted when the store is opened and every
+    purge_every writes, so keys that are never written again (a misspelled
+    search, say) do not stay in the file forever.
+    """
+
+    def __init__(self, path=CACHE_PATH, purge_every=PURGE_EVERY):
+        self.path = path
+        self.purge_every = purge_every
+        self._local = threading.local()
+        self._writes = itertools.count(1)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+        self.purge_expired()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, default=MISSING):
+        row = self._connection().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def set(self, key, value, ttl):
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + ttl),
+            )
+        if next(self._writes) % self.purge_every == 0:
+            self.purge_expired()
+
+    def purge_expired(self):
+        """Delete the expired rows, returning how many there were"""
+        with self._connection() as conn:
+            return conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),)).rowcount
+
+
+class TMDbCache:
+    """Two-tier cache for TMDb responses: in-process LRU over a SQLite store
+
+    None is cached as a negative result with a shorter TTL, so titles TMDb
+    does not know are not searched again on every render.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=DEFAULT_TTL, negative_ttl=NEGATIVE_TTL, max_entries=MEMORY_ENTRIES):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.memory = TTLCache(max_entries, ttl)
+        self.disk = SQLiteStore(path) if path else None
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Cached value (possibly None for a negative result), or MISSING"""
+        value = self.memory.get(key)
+        if value is not MISSING:
+            return value
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not MISSING:
+                self.disk_hits += 1
+                self.memory.set(key, value, self.negative_ttl if value is None else self.ttl)
+                return value
+        self.misses += 1
+        return MISSING
+
+    def set(self, key, value):
+        ttl = self.negative_ttl if value is None else self.ttl
+        self.memory.set(key, value, ttl)
+        if self.disk is not None:
+            self.disk.set(key, value, ttl)
+
+    def get_or_fetch(self, key, fetch):
+        value = self.get(key)
+        if value is MISSING:
+            value = fetch()
+            self.set(key, value)
+        return value
+
+    def stats(self):
+        memory = self.memory.stats()
+        return {
+            "memory_hits": memory["hits"],
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": memory["evictions"],
+            "memory_size": memory["size"],
+        }
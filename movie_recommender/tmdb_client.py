@@ -0,0 +1,190 @@
+import copy
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .title_index import normalize_title
+from .tracing import count, stage
+
+TMDB_API_URL = os.environ.get("TMDB_API_URL", "https://api.themoviedb.org/3")
+DEFAULT_TIMEOUT = 10
+MAX_WORKERS = 5
+
+
+def validate_api_key(api_key):
+    """(ok, message) for the format of a TMDb API key, without calling the API"""
+    if not api_key:
+        return False, "API key is empty"
+    if len(api_key) < 20:
+        return False, "API key seems too short"
+    if " " in api_key:
+        return False, "API key contains spaces"
+    return True, "Valid format"
+
+
+class TMDbError(Exception):
+    """TMDb request failed with a message fit to show the user"""
+
+
+class TMDbAuthError(TMDbError):
+    pass
+
+
+class TMDbRateLimitError(TMDbError):
+    pass
+
+
+class RateLimiter:
+    """Thread-safe token bucket allowing rate requests per second on average"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class TMDbClient:
+    """TMDb client reusing pooled connections and fetching independent requests in parallel
+
+    base_url can point at a local stub server for testing. With a cache
+    (see tmdb_cache.TMDbCache) searches are keyed by normalized title and
+    details/credits by movie id; errors are never cached. An optional
+    RateLimiter is acquired before every request.
+    """
+
+    def __init__(self, api_key, base_url=TMDB_API_URL, timeout=DEFAULT_TIMEOUT, max_workers=MAX_WORKERS,
+                 cache=None, rate_limiter=None):
+        self.api_key = api_key
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tmdb")
+        self._shared = False
+
+    def with_api_key(self, api_key):
+        """Client for another API key over this client's connections, threads, cache and rate limiter
+
+        Closing it leaves those open; they belong to this client.
+        """
+        client = copy.copy(self)
+        client.api_key = api_key
+        client._shared = True
+        return client
+
+    def close(self):
+        if self._shared:
+            return
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _get(self, path, **params):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        count("tmdb_http_requests")
+        with stage("tmdb_http"):
+            response = self.session.get(
+                f"{self.base_url}{path}",
+                params={"api_key": self.api_key, **params},
+                timeout=self.timeout,
+            )
+        if response.status_code != 200:
+            count("tmdb_http_errors")
+        if response.status_code == 401:
+            raise TMDbAuthError("Invalid API key. Please check your TMDb API key.")
+        if response.status_code == 429:
+            raise TMDbRateLimitError("API rate limit exceeded. Please wait a moment and try again.")
+        if response.status_code != 200:
+            raise TMDbError(f"API error: HTTP {response.status_code}")
+        return response.json()
+
+    def _cached(self, key, fetch):
+        if self.cache is None:
+            return fetch()
+        return self.cache.get_or_fetch(key, fetch)
+
+    def check_api_key(self):
+        """Make one live request, never served from the cache; raises TMDbAuthError if the key is rejected"""
+        self._get("/configuration")
+
+    def search_movie(self, title):
+        """Best TMDb search result for a title, or None"""
+        def fetch():
+            results = self._get("/search/movie", query=title).get("results")
+            return results[0] if results else None
+
+        return self._cached(f"search:{normalize_title(title)}", fetch)
+
+    def get_movie(self, movie_id, require_credits=False):
+        """Movie details and credits, fetched concurrently
+
+        Credits are optional unless require_credits: if that request fails
+        None is returned in their place.
+        """
+        credits = self._executor.submit(
+            self._cached, f"credits:{movie_id}", lambda: self._get(f"/movie/{movie_id}/credits")
+        )
+        details = self._cached(f"movie:{movie_id}", lambda: self._get(f"/movie/{movie_id}"))
+        try:
+            cast_data = credits.result()
+        except (TMDbError, requests.exceptions.RequestException):
+            if require_credits:
+                raise
+            cast_data = None
+        return details, cast_data
+
+    def get_movie_details(self, title):
+        """(details, credits) for the best match of a title, or (None, None) if there is none"""
+        result = self.search_movie(title)
+        if result is None:
+            return None, None
+        try:
+            return self.get_movie(result["id"])
+        except (TMDbAuthError, TMDbRateLimitError):
+            raise
+        except TMDbError:
+            return None, None
+
+    def get_poster_paths(self, titles):
+        """Poster path per title, looked up in parallel
+
+        None where the movie has no poster; titles whose lookup failed are
+        left out, so they are not mistaken for movies without one.
+        """
+        failed = object()
+
+        def poster_path(title):
+            try:
+                result = self.search_movie(title)
+            except (TMDbError, requests.exceptions.RequestException):
+                return failed
+            return result.get("poster_path") if result else None
+
+        paths = zip(titles, self._executor.map(poster_path, titles))
+        return {title: path for title, path in paths if path is not failed}
@@ -0,0 +1,164 @@
+import cProfile
+import io
+import json
+import pstats
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+METRIC_PREFIX = "movie_recommender"
+PROFILE_LINES = 30
+
+
+class Tracer:
+    """Process-wide stage timers and counters, cheap enough to leave on in production
+
+    Each stage keeps a call count, total and maximum duration; counters are
+    running totals. Components that already count things themselves, like
+    the caches, are registered as collectors and read at snapshot time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timers = {}
+        self._counters = {}
+        self._collectors = {}
+
+    @contextmanager
+    def stage(self, name):
+        """Time the block as one call of stage name, whether or not it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, name, seconds):
+        with self._lock:
+            timer = self._timers.setdefault(name, [0, 0.0, 0.0])
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def register(self, name, stats):
+        """Report the numbers in the dict stats() returns as gauges named name_<key>"""
+        self._collectors[name] = stats
+
+    def snapshot(self):
+        """Current timers, counters and collector gauges as plain dicts"""
+        with self._lock:
+            timers = {
+                name: {"calls": calls, "seconds": seconds, "max_seconds": longest}
+                for name, (calls, seconds, longest) in self._timers.items()
+            }
+            counters = dict(self._counters)
+        gauges = {}
+        for prefix, stats in list(self._collectors.items()):
+            for key, value in stats().items():
+                gauges[f"{prefix}_{key}"] = value
+        return {"timers": timers, "counters": counters, "gauges": gauges}
+
+    def reset(self):
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+
+
+TRACER = Tracer()
+
+
+def stage(name):
+    """Time a block on the process-wide tracer"""
+    return TRACER.stage(name)
+
+
+def count(name, n=1):
+    """Add n to a counter on the process-wide tracer"""
+    TRACER.count(name, n)
+
+
+def since(before, after):
+    """What happened between two snapshots; the maximum durations and gauges are those of after
+
+    In a server process other sessions' work in the same interval is
+    included too.
+    """
+    timers = {}
+    for name, timer in after["timers"].items():
+        previous = before["timers"].get(name, {"calls": 0, "seconds": 0.0})
+        if timer["calls"] > previous["calls"]:
+            timers[name] = dict(timer, calls=timer["calls"] - previous["calls"],
+                                seconds=timer["seconds"] - previous["seconds"])
+    counters = {
+        name: value - before["counters"].get(name, 0)
+        for name, value in after["counters"].items() if value != before["counters"].get(name, 0)
+    }
+    return {"timers": timers, "counters": counters, "gauges": after["gauges"]}
+
+
+def _metric_name(name):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", f"{METRIC_PREFIX}_{name}")
+
+
+def to_prometheus(snapshot):
+    """A snapshot in the Prometheus text exposition format"""
+    lines = []
+    stage_metrics = [
+        ("stage_calls_total", "counter", "calls"),
+        ("stage_seconds_total", "counter", "seconds"),
+        ("stage_max_seconds", "gauge", "max_seconds"),
+    ]
+    for suffix, kind, field in stage_metrics:
+        metric = _metric_name(suffix)
+        lines.append(f"# TYPE {metric} {kind}")
+        for name, timer in sorted(snapshot["timers"].items()):
+            lines.append(f'{metric}{{stage="{name}"}} {timer[field]}')
+    for name, value in sorted(snapshot["counters"].items()):
+        metric = _metric_name(f"{name}_total")
+        lines.extend([f"# TYPE {metric} counter", f"{metric} {value}"])
+    for name, value in sorted(snapshot["gauges"].items()):
+        metric = _metric_name(name)
+        lines.extend([f"# TYPE {metric} gauge", f"{metric} {value}"])
+    return "\n".join(lines) + "\n"
+
+
+def to_jsonl(snapshot, **labels):
+    """A snapshot as JSON lines, one metric per line, stamped with the time and any labels"""
+    timestamp = time.time()
+    records = [
+        dict(labels, time=timestamp, type="stage", name=name, **timer)
+        for name, timer in sorted(snapshot["timers"].items())
+    ]
+    records += [
+        dict(labels, time=timestamp, type="counter", name=name, value=value)
+        for name, value in sorted(snapshot["counters"].items())
+    ]
+    records += [
+        dict(labels, time=timestamp, type="gauge", name=name, value=value)
+        for name, value in sorted(snapshot["gauges"].items())
+    ]
+    return "".join(json.dumps(record) + "\n" for record in records)
+
+
+@contextmanager
+def profiled(lines=PROFILE_LINES):
+    """Profile the block with cProfile; the yielded dict gets its top functions by cumulative time as 'text'
+
+    Only the calling thread is profiled, so work done in thread pools shows
+    up as time spent waiting for it.
+    """
+    profile = cProfile.Profile()
+    result = {}
+    profile.enable()
+    try:
+        yield result
+    finally:
+        profile.disable()
+        out = io.StringIO()
+        pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(lines)
+        result["text"] = out.getvalue()
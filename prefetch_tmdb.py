@@ -0,0 +1,120 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from movie_recommender.metadata_store import METADATA_DIR, NOT_FOUND, compact, make_record, read_records, write_part
+from movie_recommender.title_index import normalize_title
+from movie_recommender.tmdb_client import TMDB_API_URL, RateLimiter, TMDbAuthError, TMDbClient, TMDbRateLimitError
+
+RATE_LIMIT_BACKOFF = 10
+MAX_ATTEMPTS = 3
+
+
+def pending_titles(csv_path, directory, retry_not_found_days):
+    """Catalog titles with no stored metadata, or a not-found result old enough to retry"""
+    titles = {}
+    for title in pd.read_csv(csv_path, usecols=["movie_title"])["movie_title"]:
+        titles.setdefault(normalize_title(title), title)
+
+    records = read_records(directory)
+    retry_before = (datetime.now() - timedelta(days=retry_not_found_days)).isoformat(timespec="seconds")
+    done = records[(records["status"] != NOT_FOUND) | (records["fetched_at"] >= retry_before)]
+    for key in done["key"]:
+        titles.pop(key, None)
+    return list(titles.values())
+
+
+def fetch_record(client, title):
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            # Only an empty search is not found; details and credits errors fail the title, so it is retried
+            result = client.search_movie(title)
+            if result is None:
+                return make_record(title, None, None)
+            details, cast_data = client.get_movie(result["id"], require_credits=True)
+            return make_record(title, details, cast_data)
+        except TMDbRateLimitError:
+            if attempt == MAX_ATTEMPTS:
+                raise
+            time.sleep(RATE_LIMIT_BACKOFF * attempt)
+
+
+def prefetch(client, titles, directory, workers, batch_size):
+    """Fetch metadata for titles, flushing a Parquet part every batch_size results"""
+    batch, fetched, failed = [], 0, 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(fetch_record, client, title): title for title in titles}
+        try:
+            for future in as_completed(futures):
+                try:
+                    batch.append(future.result())
+                except TMDbAuthError:
+                    raise
+                except Exception as e:
+                    failed += 1
+                    print(f"❌ {futures[future]}: {e}")
+                    continue
+
+                fetched += 1
+                if len(batch) >= batch_size:
+                    write_part(batch, directory)
+                    batch = []
+                    print(f"📦 {fetched}/{len(titles)} titles fetched")
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        finally:
+            # Whatever completed is kept, so an interrupted run resumes from here
+            write_part(batch, directory)
+    return fetched, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prefetch TMDb metadata for the whole catalog")
+    parser.add_argument("--csv", default="main_data.csv", help="Catalog CSV with a movie_title column")
+    parser.add_argument("--out", default=METADATA_DIR, help="Metadata store directory")
+    parser.add_argument("--api-key", default=os.environ.get("TMDB_API_KEY"), help="TMDb API key (or TMDB_API_KEY)")
+    parser.add_argument("--base-url", default=TMDB_API_URL, help="TMDb API base URL, e.g. a local stub")
+    parser.add_argument("--rate", type=float, default=20, help="Maximum requests per second")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent titles in flight")
+    parser.add_argument("--batch-size", type=int, default=200, help="Records per Parquet part file")
+    parser.add_argument("--retry-not-found-days", type=float, default=7,
+                        help="Retry titles TMDb did not know after this many days")
+    parser.add_argument("--limit", type=int, help="Fetch at most this many titles")
+    parser.add_argument("--compact", action="store_true", help="Merge part files when done")
+    args = parser.parse_args()
+
+    if not args.api_key:
+        parser.error("a TMDb API key is required (--api-key or TMDB_API_KEY)")
+
+    titles = pending_titles(args.csv, args.out, args.retry_not_found_days)[:args.limit]
+    print(f"🎬 {len(titles)} titles to fetch into {args.out}")
+
+    client = TMDbClient(args.api_key, base_url=args.base_url, max_workers=args.workers * 2,
+                        rate_limiter=RateLimiter(args.rate))
+    start = time.perf_counter()
+    try:
+        fetched, failed = prefetch(client, titles, args.out, args.workers, args.batch_size)
+    except TMDbAuthError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\n⏸️ Interrupted; run again to resume")
+        sys.exit(130)
+    finally:
+        client.close()
+
+    print(f"✅ Fetched {fetched} titles ({failed} failed) in {time.perf_counter() - start:.1f}s")
+    if args.compact:
+        compact(args.out)
+        print(f"🗜️ Compacted {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,17 @@
 import streamlit as st
 import numpy as np
-import pandas as pd
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import pickle
 import requests
-from bs4 import BeautifulSoup
 import json
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime
-from urllib.parse import quote_plus
+from movie_recommender.metadata_store import METADATA_DIR, MetadataStore
+from movie_recommender.model_store import MODEL_DIR, load_or_build_engine, model_version, read_manifest
+from movie_recommender.result_cache import ResultCache
+from movie_recommender.reviews import ReviewPipeline
+from movie_recommender.sentiment import SentimentScorer, load_sentiment_models
+from movie_recommender.tmdb_cache import CACHE_PATH, MISSING, TMDbCache
+from movie_recommender.tmdb_client import TMDbAuthError, TMDbClient, TMDbError, validate_api_key
+from movie_recommender.tracing import TRACER, count, profiled, since, stage, to_jsonl, to_prometheus
 
 # Page configuration
 st.set_page_config(
@@ -66,6 +69,9 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+REVIEW_WAIT_SECONDS = 10
+RECOMMENDATION_COUNT = 10
+
 # Initialize session state
 if 'recommendations_data' not in st.session_state:
     st.session_state.recommendations_data = None
@@ -77,106 +83,108 @@ if 'tmdb_api_key' not in st.session_state:
 @st.cache_data
 def load_models():
     try:
-        data = pd.read_csv('main_data.csv')
-        
-        try:
-            nlp_model = pickle.load(open('nlp_model.pkl', 'rb'))
-            vectorizer = pickle.load(open('tranform.pkl', 'rb'))
-            return nlp_model, vectorizer, data
-        except Exception as model_error:
-            st.warning(f"Could not load sentiment analysis models: {str(model_error)}")
-            st.info("The app will work without sentiment analysis. Only movie recommendations will be available.")
-            return None, None, data
-            
-    except Exception as e:
-        st.error(f"Error loading data: {str(e)}")
-        st.error("Please make sure you have run 'python setup_files.py' first to copy the required files.")
-        return None, None, None
+        return load_sentiment_models('nlp_model.pkl', 'tranform.pkl')
+    except Exception as model_error:
+        st.warning(f"Could not load sentiment analysis models: {str(model_error)}")
+        st.info("The app will work without sentiment analysis. Only movie recommendations will be available.")
+        return None, None
 
-@st.cache_data
-def create_similarity_matrix(data):
-    """Create cosine similarity matrix for movie recommendations"""
+@st.cache_resource(max_entries=1)
+def load_similarity_engine(version=None):
+    """Load the persisted similarity engine, rebuilding it only if main_data.csv changed
+    
+    version is the saved model's model_version, so a new model is loaded as
+    soon as it is published; only the latest engine is kept.
+    """
     try:
-        cv = CountVectorizer()
-        count_matrix = cv.fit_transform(data['comb'])
-        similarity = cosine_similarity(count_matrix)
-        return similarity
+        with stage('model_load'):
+            return load_or_build_engine('main_data.csv', MODEL_DIR)
     except Exception as e:
-        st.error(f"Error creating similarity matrix: {str(e)}")
+        st.error(f"Error loading data: {str(e)}")
+        st.error("Please make sure you have run 'python setup_files.py' first to copy the required files.")
         return None
 
-def get_movie_recommendations(movie_title, data, similarity):
+@st.cache_resource
+def get_result_cache():
+    """Recommendations and page payloads shared by every session in this process"""
+    cache = ResultCache()
+    TRACER.register('result_cache', cache.stats)
+    return cache
+
+def load_current_engine():
+    """The engine for the model currently published in MODEL_DIR, with the result cache keyed to it"""
+    similarity = load_similarity_engine(model_version(read_manifest(MODEL_DIR)))
+    if similarity is not None:
+        get_result_cache().set_version(model_version(similarity.manifest))
+    return similarity
+
+def rank_movies(movie_title, similarity):
+    # Resolves the title (tolerating small misspellings) and ranks the top 10, excluding the movie itself
+    with stage('recommend'):
+        return similarity.recommend([movie_title], k=RECOMMENDATION_COUNT)[0]
+
+def get_movie_recommendations(movie_title, similarity):
     """Get movie recommendations based on similarity"""
-    movie_title = movie_title.lower()
+    recommended_movies = get_result_cache().get_recommendations(
+        movie_title, RECOMMENDATION_COUNT, lambda: rank_movies(movie_title, similarity)
+    )
     
-    if movie_title not in data['movie_title'].str.lower().values:
+    if recommended_movies is None:
         return "Sorry! The movie you requested is not in our database. Please check the spelling or try with some other movies"
     
-    # Find the index of the movie
-    idx = data[data['movie_title'].str.lower() == movie_title].index[0]
-    
-    # Get similarity scores
-    sim_scores = list(enumerate(similarity[idx]))
-    sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
-    
-    # Get top 10 similar movies (excluding the movie itself)
-    sim_scores = sim_scores[1:11]
-    
-    movie_indices = [i[0] for i in sim_scores]
-    recommended_movies = data['movie_title'].iloc[movie_indices].tolist()
-    
     return recommended_movies
 
-def validate_api_key(api_key):
-    if not api_key:
-        return False, "API key is empty"
-    if len(api_key) < 20:
-        return False, "API key seems too short"
-    if " " in api_key:
-        return False, "API key contains spaces"
-    return True, "Valid format"
+@st.cache_resource
+def load_metadata_store():
+    """Prefetched TMDb metadata (python prefetch_tmdb.py), or None if there is none"""
+    try:
+        return MetadataStore(METADATA_DIR)
+    except Exception:
+        return None
+
+@st.cache_resource
+def get_tmdb_cache():
+    """TMDb response cache shared by every session in this process, backed by SQLite across processes"""
+    cache = TMDbCache(CACHE_PATH)
+    TRACER.register('tmdb_cache', cache.stats)
+    return cache
+
+@st.cache_resource
+def get_tmdb_pool():
+    """TMDb connections and threads shared by every session and API key in this process"""
+    return TMDbClient(None, cache=get_tmdb_cache())
+
+def get_tmdb_client(api_key):
+    """TMDb client for an API key over the shared pool, so new keys add no threads or sockets"""
+    return get_tmdb_pool().with_api_key(api_key)
 
 def get_movie_details_from_tmdb(movie_title, api_key):
+    # Serve prefetched metadata first; only titles missing from the store hit the API
+    store = load_metadata_store()
+    stored = store.get_movie_details(movie_title) if store is not None else None
+    if stored is not None and stored[0]:
+        count('metadata_store_hits')
+        return stored
+    count('metadata_store_misses')
+    
     is_valid, message = validate_api_key(api_key)
     if not is_valid:
         st.error(f"Invalid API key: {message}")
         return None, None
     
     try:
-        encoded_title = quote_plus(movie_title)
-        search_url = f"https://api.themoviedb.org/3/search/movie?api_key={api_key}&query={encoded_title}"
-        
-        response = requests.get(search_url, timeout=10)
+        with stage('tmdb_details'):
+            movie_details, cast_data = get_tmdb_client(api_key).get_movie_details(movie_title)
         
-        if response.status_code == 401:
-            st.error("Invalid API key. Please check your TMDb API key.")
-            return None, None
-        elif response.status_code == 429:
-            st.error("API rate limit exceeded. Please wait a moment and try again.")
-            return None, None
-        elif response.status_code != 200:
-            st.error(f"API error: HTTP {response.status_code}")
-            return None, None
-        
-        search_results = response.json()
-        if search_results['results']:
-            movie_id = search_results['results'][0]['id']
-            
-            details_url = f"https://api.themoviedb.org/3/movie/{movie_id}?api_key={api_key}"
-            details_response = requests.get(details_url, timeout=10)
-            
-            if details_response.status_code == 200:
-                movie_details = details_response.json()
-                
-                cast_url = f"https://api.themoviedb.org/3/movie/{movie_id}/credits?api_key={api_key}"
-                cast_response = requests.get(cast_url, timeout=10)
-                cast_data = cast_response.json() if cast_response.status_code == 200 else {}
-                
-                return movie_details, cast_data
+        if movie_details:
+            return movie_details, cast_data
         
         st.warning(f"No movie found with title: {movie_title}")
         return None, None
         
+    except TMDbError as e:
+        st.error(str(e))
+        return None, None
     except requests.exceptions.Timeout:
         st.error("Request timed out. Please check your internet connection and try again.")
         return None, None
@@ -191,75 +199,98 @@ def get_movie_details_from_tmdb(movie_title, api_key):
         st.error(f"Unexpected error: {str(e)}")
         return None, None
 
-def simple_sentiment_analysis(text):
-    """Simple sentiment analysis using keyword matching"""
-    positive_words = ['good', 'great', 'excellent', 'amazing', 'awesome', 'fantastic', 'wonderful', 'brilliant', 'perfect', 'outstanding', 'superb', 'magnificent', 'incredible', 'spectacular', 'marvelous', 'love', 'loved', 'like', 'enjoy', 'enjoyed', 'best', 'better', 'beautiful', 'stunning', 'impressive', 'remarkable', 'extraordinary']
-    negative_words = ['bad', 'terrible', 'awful', 'horrible', 'worst', 'hate', 'hated', 'boring', 'disappointing', 'poor', 'weak', 'stupid', 'ridiculous', 'pathetic', 'waste', 'sucks', 'sucked', 'disgusting', 'annoying', 'irritating', 'frustrating', 'mediocre', 'bland', 'dull', 'confusing']
-    
-    text_lower = text.lower()
-    positive_count = sum(1 for word in positive_words if word in text_lower)
-    negative_count = sum(1 for word in negative_words if word in text_lower)
-    
-    if positive_count > negative_count:
-        return 'Positive'
-    elif negative_count > positive_count:
-        return 'Negative'
-    else:
-        return 'Neutral'
+def get_poster_paths(movies, api_key):
+    """Poster paths by title, from prefetched metadata first and TMDb in parallel for the rest"""
+    with stage('poster_lookup'):
+        store = load_metadata_store()
+        poster_paths = store.get_poster_paths(movies) if store is not None else {}
+        missing = [movie for movie in movies if movie not in poster_paths]
+        if missing:
+            poster_paths.update(get_tmdb_client(api_key).get_poster_paths(missing))
+    return poster_paths
 
-def get_movie_reviews(imdb_id, nlp_model, vectorizer):
-    """Scrape and analyze movie reviews from IMDb"""
-    try:
-        url = f'https://www.imdb.com/title/{imdb_id}/reviews/?ref_=tt_ov_rt'
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/85.0.4183.83 Safari/537.36'
-        }
-        
-        response = requests.get(url, headers=headers)
-        
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.content, 'lxml')
-            review_elements = soup.find_all("div", {"class": "ipc-html-content-inner-div"})
-            
-            reviews_data = []
-            for review_elem in review_elements[:10]:
-                if review_elem.string:
-                    review_text = review_elem.string
-                    
-                    try:
-                        if nlp_model is not None and vectorizer is not None:
-                            review_vector = vectorizer.transform([review_text])
-                            sentiment_pred = nlp_model.predict(review_vector)[0]
-                            sentiment = 'Positive' if sentiment_pred else 'Negative'
-                        else:
-                            sentiment = simple_sentiment_analysis(review_text)
-                    except Exception:
-                        sentiment = simple_sentiment_analysis(review_text)
-                    
-                    reviews_data.append({
-                        'text': review_text,
-                        'sentiment': sentiment
-                    })
-            
-            return reviews_data
+def get_page_data(movie_title, recommendations, api_key):
+    """Details, cast and recommendation posters for a movie's page, shared across sessions
+    
+    Returns None, without caching it, if the details could not be fetched.
+    A page missing the cast or a poster because a TMDb request failed is
+    shown but not cached, so the next visit asks TMDb again.
+    """
+    cache = get_result_cache()
+    page = cache.get_page(movie_title, RECOMMENDATION_COUNT)
+    if page is not MISSING:
+        return page
+    
+    movie_details, cast_data = get_movie_details_from_tmdb(movie_title, api_key)
+    if not movie_details:
+        return None
+    poster_paths = get_poster_paths(recommendations[:5], api_key)
+    page = {
+        'movie_details': movie_details,
+        'cast_data': cast_data or {},
+        'recommendations': recommendations,
+        'selected_movie': movie_title,
+        'poster_paths': poster_paths
+    }
+    if cast_data is not None and all(movie in poster_paths for movie in recommendations[:5]):
+        cache.set_page(movie_title, RECOMMENDATION_COUNT, page)
+    return page
+
+@st.cache_resource
+def get_review_pipeline():
+    """Background review fetcher and scorer shared by every session in this process"""
+    nlp_model, vectorizer = load_models()
+    scorer = SentimentScorer(nlp_model, vectorizer) if nlp_model is not None and vectorizer is not None else None
+    pipeline = ReviewPipeline(scorer)
+    TRACER.register('review_cache', pipeline.cache.stats)
+    return pipeline
+
+def render_reviews(reviews):
+    """Display review sentiment metrics and review cards"""
+    if not reviews:
+        st.info("No reviews found for this movie.")
+        return
+    
+    positive_reviews = sum(1 for r in reviews if r['sentiment'] == 'Positive')
+    negative_reviews = sum(1 for r in reviews if r['sentiment'] == 'Negative')
+    neutral_reviews = sum(1 for r in reviews if r['sentiment'] == 'Neutral')
+    
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Total Reviews", len(reviews))
+    if positive_reviews > 0:
+        col2.metric("Positive", positive_reviews, delta=f"{positive_reviews/len(reviews)*100:.1f}%")
+    if negative_reviews > 0:
+        col3.metric("Negative", negative_reviews, delta=f"{negative_reviews/len(reviews)*100:.1f}%")
+    if neutral_reviews > 0:
+        col4.metric("Neutral", neutral_reviews)
+    
+    for i, review in enumerate(reviews, 1):
+        if review['sentiment'] == 'Positive':
+            sentiment_class = "review-positive"
+            sentiment_emoji = "👤"
+        elif review['sentiment'] == 'Negative':
+            sentiment_class = "review-negative"
+            sentiment_emoji = "👤"
+        else:
+            sentiment_class = "review-neutral"
+            sentiment_emoji = "👤"
         
-        return []
-    except Exception as e:
-        st.error(f"Error fetching reviews: {str(e)}")
-        return []
+        st.markdown(f"""
+        <div class="{sentiment_class}">
+            <strong>{sentiment_emoji} Person {i} - {review['sentiment']} Review</strong><br>
+            {review['text'][:300]}{'...' if len(review['text']) > 300 else ''}
+        </div>
+        """, unsafe_allow_html=True)
 
 def main():
-    nlp_model, vectorizer, data = load_models()
+    nlp_model, vectorizer = load_models()
+    similarity = load_current_engine()
     
-    if data is None:
+    if similarity is None:
         st.error("Failed to load movie data. Please check if all files are present.")
         st.info("Make sure to run: `python setup_files.py` first to copy the required files.")
         return
     
-    similarity = create_similarity_matrix(data)
-    if similarity is None:
-        return
-    
     st.markdown('<h1 class="main-header">🎬 Movie Recommendation System</h1>', unsafe_allow_html=True)
     
     sentiment_available = nlp_model is not None and vectorizer is not None
@@ -285,11 +316,15 @@ def main():
                 
                 if st.button("🔍 Test API Key"):
                     with st.spinner("Testing API key..."):
-                        test_details, _ = get_movie_details_from_tmdb("Batman", st.session_state.tmdb_api_key)
-                        if test_details:
+                        # A live, uncached request: the metadata store and the shared cache answer any key
+                        try:
+                            with TMDbClient(st.session_state.tmdb_api_key) as client:
+                                client.check_api_key()
                             st.success("🎉 API key works perfectly!")
-                        else:
-                            st.error("❌ API key test failed")
+                        except TMDbAuthError as e:
+                            st.error(f"❌ API key test failed: {e}")
+                        except (TMDbError, requests.exceptions.RequestException) as e:
+                            st.error(f"❌ Could not reach TMDb to test the key: {e}")
             else:
                 st.warning(f"⚠️ {message}")
         else:
@@ -310,15 +345,14 @@ def main():
         
         st.markdown("---")
         st.header("📊 Dataset Info")
-        if data is not None:
-            st.metric("Total Movies", len(data))
-            st.write("**Sample Movies:**")
-            for movie in data['movie_title'].head(5):
-                st.write(f"• {movie.title()}")
+        st.metric("Total Movies", len(similarity.titles))
+        st.write("**Sample Movies:**")
+        for movie in similarity.titles.active_titles()[:5]:
+            st.write(f"• {movie.title()}")
     
     st.header("🔍 Search Movies")
     
-    movie_suggestions = sorted(data['movie_title'].str.title().tolist())
+    movie_suggestions = sorted(movie.title() for movie in similarity.titles.active_titles())
     
     col1, col2 = st.columns([3, 1])
     
@@ -339,33 +373,34 @@ def main():
             return
         
         with st.spinner("Finding similar movies..."):
-            recommendations = get_movie_recommendations(selected_movie, data, similarity)
+            recommendations = get_movie_recommendations(selected_movie, similarity)
             
             if isinstance(recommendations, str):
                 st.error(recommendations)
                 return
             
-            movie_details, cast_data = get_movie_details_from_tmdb(selected_movie, st.session_state.tmdb_api_key)
+            page = get_page_data(selected_movie, recommendations, st.session_state.tmdb_api_key)
             
-            if movie_details:
-                st.session_state.recommendations_data = {
-                    'movie_details': movie_details,
-                    'cast_data': cast_data,
-                    'recommendations': recommendations,
-                    'selected_movie': selected_movie
-                }
+            if page:
+                st.session_state.recommendations_data = page
                 st.success(f"Found {len(recommendations)} similar movies!")
             else:
                 st.error("Could not fetch movie details from TMDb. Please check your API key and movie name.")
     
     if st.session_state.recommendations_data:
-        display_movie_details(st.session_state.recommendations_data, nlp_model, vectorizer, st.session_state.tmdb_api_key, data, similarity)
+        display_movie_details(st.session_state.recommendations_data, nlp_model, vectorizer, st.session_state.tmdb_api_key, similarity)
 
-def display_movie_details(data_dict, nlp_model, vectorizer, api_key, movie_data, similarity):
+def display_movie_details(data_dict, nlp_model, vectorizer, api_key, similarity):
     """Display detailed movie information"""
     movie_details = data_dict['movie_details']
     cast_data = data_dict['cast_data']
     recommendations = data_dict['recommendations']
+    poster_paths = data_dict['poster_paths']
+    
+    # Start fetching reviews in the background so the rest of the page renders first
+    reviews_future = None
+    if movie_details.get('imdb_id'):
+        reviews_future = get_review_pipeline().submit(movie_details['imdb_id'])
     
     st.markdown("---")
     st.header(f"🎬 {movie_details['title']}")
@@ -431,42 +466,8 @@ def display_movie_details(data_dict, nlp_model, vectorizer, api_key, movie_data,
             analysis_method = "Keyword-Based Analysis"
             st.info("ℹ️ Using fallback sentiment analysis (keyword-based) as ML models are unavailable.")
         
-        with st.spinner("Analyzing movie reviews..."):
-            reviews = get_movie_reviews(movie_details['imdb_id'], nlp_model, vectorizer)
-        
-        if reviews:
-            positive_reviews = sum(1 for r in reviews if r['sentiment'] == 'Positive')
-            negative_reviews = sum(1 for r in reviews if r['sentiment'] == 'Negative')
-            neutral_reviews = sum(1 for r in reviews if r['sentiment'] == 'Neutral')
-            
-            col1, col2, col3, col4 = st.columns(4)
-            col1.metric("Total Reviews", len(reviews))
-            if positive_reviews > 0:
-                col2.metric("Positive", positive_reviews, delta=f"{positive_reviews/len(reviews)*100:.1f}%")
-            if negative_reviews > 0:
-                col3.metric("Negative", negative_reviews, delta=f"{negative_reviews/len(reviews)*100:.1f}%")
-            if neutral_reviews > 0:
-                col4.metric("Neutral", neutral_reviews)
-            
-            for i, review in enumerate(reviews, 1):
-                if review['sentiment'] == 'Positive':
-                    sentiment_class = "review-positive"
-                    sentiment_emoji = "👤"
-                elif review['sentiment'] == 'Negative':
-                    sentiment_class = "review-negative"
-                    sentiment_emoji = "👤"
-                else:
-                    sentiment_class = "review-neutral"
-                    sentiment_emoji = "👤"
-                
-                st.markdown(f"""
-                <div class="{sentiment_class}">
-                    <strong>{sentiment_emoji} Person {i} - {review['sentiment']} Review</strong><br>
-                    {review['text'][:300]}{'...' if len(review['text']) > 300 else ''}
-                </div>
-                """, unsafe_allow_html=True)
-        else:
-            st.info("No reviews found for this movie.")
+        # Filled in at the end of the page, once the background fetch finishes
+        reviews_container = st.container()
     
     # Recommendations section
     st.subheader("🎯 Similar Movies You Might Like")
@@ -474,11 +475,10 @@ def display_movie_details(data_dict, nlp_model, vectorizer, api_key, movie_data,
     rec_cols = st.columns(5)
     for i, movie in enumerate(recommendations[:5]):
         with rec_cols[i]:
-            # Try to get poster for recommended movie
-            rec_details, _ = get_movie_details_from_tmdb(movie, api_key)
+            poster_path = poster_paths.get(movie)
             
-            if rec_details and rec_details.get('poster_path'):
-                poster_url = f"https://image.tmdb.org/t/p/w200{rec_details['poster_path']}"
+            if poster_path:
+                poster_url = f"https://image.tmdb.org/t/p/w200{poster_path}"
                 st.image(poster_url, width=150)
             else:
                 st.write("🎬")
@@ -488,16 +488,11 @@ def display_movie_details(data_dict, nlp_model, vectorizer, api_key, movie_data,
             if st.button(f"View Details", key=f"rec_{i}"):
                 # Update session state to show this movie's details
                 with st.spinner("Loading movie details..."):
-                    new_recommendations = get_movie_recommendations(movie, movie_data, similarity)
-                    new_movie_details, new_cast_data = get_movie_details_from_tmdb(movie, api_key)
+                    new_recommendations = get_movie_recommendations(movie, similarity)
+                    new_page = get_page_data(movie, new_recommendations, api_key)
                     
-                    if new_movie_details:
-                        st.session_state.recommendations_data = {
-                            'movie_details': new_movie_details,
-                            'cast_data': new_cast_data,
-                            'recommendations': new_recommendations,
-                            'selected_movie': movie
-                        }
+                    if new_page:
+                        st.session_state.recommendations_data = new_page
                         st.rerun()
     
     # Show remaining recommendations in a list
@@ -505,6 +500,64 @@ def display_movie_details(data_dict, nlp_model, vectorizer, api_key, movie_data,
         with st.expander("View More Recommendations"):
             for movie in recommendations[5:]:
                 st.write(f"• {movie.title()}")
+    
+    if reviews_future is not None:
+        with reviews_container:
+            try:
+                with st.spinner("Analyzing movie reviews..."), stage('reviews_wait'):
+                    reviews = reviews_future.result(timeout=REVIEW_WAIT_SECONDS)
+            except FutureTimeoutError:
+                st.info("⏳ Reviews are still loading and will appear the next time this page refreshes.")
+            except Exception as e:
+                st.error(f"Error fetching reviews: {str(e)}")
+            else:
+                render_reviews(reviews)
+
+def render_debug_panel(rerun, profile):
+    """Sidebar expander with the last rerun's stage timings, process-wide metrics and an optional profile"""
+    if profile is not None:
+        st.session_state.last_profile = profile['text']
+    
+    with st.sidebar.expander("🐞 Debug Metrics"):
+        st.write("**Last rerun**")
+        timers = sorted(rerun['timers'].items(), key=lambda item: -item[1]['seconds'])
+        st.table({
+            'stage': [name for name, _ in timers],
+            'calls': [timer['calls'] for _, timer in timers],
+            'ms': [round(timer['seconds'] * 1000, 1) for _, timer in timers],
+        })
+        if rerun['counters']:
+            st.write("**Counters**")
+            st.json(rerun['counters'])
+        st.write("**Caches**")
+        st.json(rerun['gauges'], expanded=False)
+        
+        snapshot = TRACER.snapshot()
+        st.download_button("⬇️ Prometheus metrics", to_prometheus(snapshot), file_name="metrics.prom")
+        st.download_button("⬇️ JSON lines", to_jsonl(snapshot), file_name="metrics.jsonl")
+        
+        if st.button("⏱️ Profile Next Rerun"):
+            st.session_state.profile_next_rerun = True
+        if st.session_state.get('profile_next_rerun'):
+            st.caption("The next rerun will be profiled with cProfile.")
+        if st.session_state.get('last_profile'):
+            st.write("**Last profiled rerun**")
+            st.code(st.session_state.last_profile)
+
+def run_page():
+    """Render the page under the tracer; ?debug=1 in the URL adds the debug panel"""
+    debug = st.query_params.get('debug') == '1'
+    before = TRACER.snapshot()
+    profile = None
+    if debug and st.session_state.get('profile_next_rerun'):
+        st.session_state.profile_next_rerun = False
+        with profiled() as profile, stage('page_render'):
+            main()
+    else:
+        with stage('page_render'):
+            main()
+    if debug:
+        render_debug_panel(since(before, TRACER.snapshot()), profile)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    run_page() 
\ No newline at end of file